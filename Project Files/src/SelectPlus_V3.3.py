@@ -6,19 +6,41 @@
 
 import os
 import sys
+import re
 import json
+import zlib
 import time
+import shlex
 import shutil
+import fnmatch
+import ntpath
+import errno
 import atexit
+import queue
+import mmap
+import heapq
+import bisect
 import hashlib
+import sqlite3
+import tarfile
+import gzip
+import lzma
+import zipfile
 import tempfile
+import itertools
 import threading
 import subprocess
+from array import array
+from collections import deque, OrderedDict
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
 
 # --- Lazy Loading for Optional Dependencies ---
 _Image = None
 _AudioSegment = None
+_numpy = None
 
 def get_pil_image():
     """Lazily imports and returns the Image class from Pillow."""
@@ -42,6 +64,17 @@ def get_audio_segment():
             pass # Will be handled by the functions that need it
     return _AudioSegment
 
+def get_numpy():
+    """Lazily imports and returns NumPy, or None to use the pure-Python fallbacks."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
 def configure_ffmpeg():
     """
     Locates the ffmpeg executable required for media operations and configures
@@ -77,7 +110,77 @@ def configure_ffmpeg():
 # Version information
 VERSION = "3.3"
 
+# --- Compact Path Storage ---
+
+class PathList:
+    """
+    A compact, append-only list of paths for very large result sets. Each
+    parent directory string is stored once; every entry is just a directory
+    id in an array plus its UTF-8 name in one shared byte buffer, so no
+    per-path string objects exist until an item is accessed.
+    """
+
+    def __init__(self, paths=()):
+        self._dirs = []            # Distinct parent directories
+        self._dir_ids = {}         # Parent directory -> index in _dirs
+        self._parents = array('I') # Directory id per entry
+        self._offsets = array('Q', [0])  # Entry i's name is _names[_offsets[i]:_offsets[i + 1]]
+        self._names = bytearray()
+        for path in paths:
+            self.append(path)
+
+    def append(self, path):
+        parent, name = os.path.split(path)
+        dir_id = self._dir_ids.get(parent)
+        if dir_id is None:
+            dir_id = self._dir_ids[parent] = len(self._dirs)
+            self._dirs.append(parent)
+        self._parents.append(dir_id)
+        self._names += name.encode("utf-8", "surrogateescape")
+        self._offsets.append(len(self._names))
+
+    def name(self, index):
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return self._names[start:end].decode("utf-8", "surrogateescape")
+
+    def __len__(self):
+        return len(self._parents)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("PathList index out of range")
+        return os.path.join(self._dirs[self._parents[index]], self.name(index))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def take(self, indices):
+        """Returns a new PathList of the given entries, sharing the directory table."""
+        subset = PathList()
+        subset._dirs, subset._dir_ids = self._dirs, self._dir_ids
+        for index in indices:
+            start, end = self._offsets[index], self._offsets[index + 1]
+            subset._parents.append(self._parents[index])
+            subset._names += self._names[start:end]
+            subset._offsets.append(len(subset._names))
+        return subset
+
+    def memory_size(self):
+        """Approximate bytes used, for status output."""
+        return (self._parents.itemsize * len(self._parents) + self._offsets.itemsize * len(self._offsets)
+                + len(self._names) + sum(sys.getsizeof(d) for d in self._dirs))
+
 # --- Global State & Configuration ---
+
+def get_config_path(filename):
+    """Returns the path of a file in the config directory next to 'src'."""
+    # Path relative to the script's location
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, '..', 'config', filename)
+
 class AppState:
     def __init__(self):
         self.current_directory = os.getcwd()
@@ -86,11 +189,15 @@ class AppState:
         self.selection = []
         self.clipboard = []
         self.clipboard_mode = None  # 'copy' or 'cut'
-        self.last_find_results = []
+        self.last_find_results = PathList()
+        self.last_find_base = self.current_directory  # Directory find results are shown relative to
+        self.last_duplicates = None  # DuplicateSets from the last 'dupes' scan
+        self.trash_batches = []    # TrashBatch objects from 'del' that can still be undone
         self.view_mode = "columns"
+        self.listing_notice = None  # Why the current listing is incomplete, if it is
         self.show_hidden = False
         self.settings = self.load_settings()
-        self.ffmpeg_configured = configure_ffmpeg()
+        self._ffmpeg_configured = None
         self.running = True
         self.lock = threading.Lock()
         self.background_tasks = {}
@@ -98,9 +205,7 @@ class AppState:
     def load_settings(self):
         """Loads settings from a JSON file."""
         try:
-            # Path relative to the script's location
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            config_path = os.path.join(script_dir, '..', 'config', 'selectplus_settings.json')
+            config_path = get_config_path('selectplus_settings.json')
             with open(config_path, 'r') as f:
                 return json.load(f)
         except (FileNotFoundError, json.JSONDecodeError):
@@ -112,6 +217,13 @@ class AppState:
                 "fast_dir_size": True
             }
 
+    @property
+    def ffmpeg_configured(self):
+        """Configures ffmpeg on first use so startup does not import pydub."""
+        if self._ffmpeg_configured is None:
+            self._ffmpeg_configured = configure_ffmpeg()
+        return self._ffmpeg_configured
+
     def get_setting(self, key, default=None):
         """Safely gets a setting value."""
         return self.settings.get(key, default)
@@ -134,13 +246,55 @@ def format_size(size_bytes):
 
 def get_terminal_width():
     """Gets the width of the terminal."""
+    if _daemon_session is not None:
+        return _daemon_session.width
     try:
         return os.get_terminal_size().columns
     except OSError:
         return 80  # Default width
 
+def get_terminal_height():
+    """Gets the height of the terminal in lines."""
+    if _daemon_session is not None:
+        return _daemon_session.height
+    try:
+        return os.get_terminal_size().lines
+    except OSError:
+        return 24  # Default height
+
+def format_duration(seconds):
+    """Formats a duration in seconds as H:MM:SS or M:SS."""
+    seconds = int(seconds)
+    hours, rem = divmod(seconds, 3600)
+    minutes, secs = divmod(rem, 60)
+    if hours:
+        return f"{hours}:{minutes:02}:{secs:02}"
+    return f"{minutes}:{secs:02}"
+
+def parse_index_ranges(args, count):
+    """Turns 'all', '3', '5-10' style arguments into sorted 0-based indices; None if invalid."""
+    if not args or args == ["all"]:
+        return range(count)
+    indices = set()
+    for arg in args:
+        try:
+            if '-' in arg:
+                start, end = map(int, arg.split('-'))
+                indices.update(i - 1 for i in range(start, end + 1) if 1 <= i <= count)
+            else:
+                index = int(arg)
+                if 1 <= index <= count:
+                    indices.add(index - 1)
+        except ValueError:
+            print(f"[ERROR] Invalid index or range: {arg}")
+            return None
+    return sorted(indices)
+
 def clear_screen():
     """Clears the console screen."""
+    if _daemon_session is not None:
+        _daemon_session.send("clear")
+        return
     os.system('cls' if os.name == 'nt' else 'clear')
 
 def print_header():
@@ -167,39 +321,948 @@ def print_header():
     if state.clipboard:
         mode = "CUT" if state.clipboard_mode == 'cut' else "COPY"
         print(f"[{len(state.clipboard)} item(s) on clipboard ({mode})]".center(width))
+    running = sum(1 for job in list(state.background_tasks.values()) if job.active)
+    if running:
+        print(f"[{running} background job(s) active - type 'jobs']".center(width))
 
-def get_directory_contents(path):
-    """Gets and sorts the contents of a directory."""
+# --- Background Jobs ---
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a background job once it has been killed. Derives from
+    BaseException (like KeyboardInterrupt) so per-item 'except Exception'
+    handlers in the file operations do not swallow it.
+    """
+
+class Progress:
+    """
+    Counters of one long operation. Callers only store numbers here; rates
+    and the ETA are worked out when a status line is actually drawn.
+    """
+    __slots__ = ("started", "ended", "done", "total", "bytes_done", "bytes_total", "current", "next_render", "shown",
+                 "lock")
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.ended = None
+        self.done = 0
+        self.total = None
+        self.bytes_done = 0
+        self.bytes_total = None
+        self.current = ""
+        self.next_render = self.started + 0.5  # Quick commands never draw a status line
+        self.shown = False
+        self.lock = threading.Lock()  # Worker threads add bytes while the owner sets counters
+
+    def add_bytes(self, nbytes):
+        """Adds to the byte count; safe to call from worker threads of the owning operation."""
+        with self.lock:
+            self.bytes_done += nbytes
+
+    def summary(self):
+        """e.g. '1,204/5,000 (24%)  310/s  1.2 GB/4.8 GB  95.3 MB/s  ETA 0:38'."""
+        elapsed = max((self.ended or time.monotonic()) - self.started, 1e-6)
+        parts = []
+        if self.total:
+            parts.append(f"{self.done:,}/{self.total:,} ({self.done * 100 // self.total}%)")
+        elif self.done:
+            parts.append(f"{self.done:,}")
+        if self.done and elapsed >= 1:
+            parts.append(f"{self.done / elapsed:,.0f}/s")
+        if self.bytes_done:
+            total = f"/{format_size(self.bytes_total)}" if self.bytes_total else ""
+            parts.append(f"{format_size(self.bytes_done)}{total}")
+            if elapsed >= 1:
+                parts.append(f"{format_size(self.bytes_done / elapsed)}/s")
+        if self.bytes_total and self.bytes_done:
+            fraction = self.bytes_done / self.bytes_total
+        elif self.total and self.done:
+            fraction = self.done / self.total
+        else:
+            fraction = None
+        if fraction and elapsed >= 1 and fraction < 1:
+            parts.append(f"ETA {format_duration(elapsed * (1 - fraction) / fraction)}")
+        return "  ".join(parts)
+
+class Job:
+    """A command running on the background worker pool."""
+
+    def __init__(self, job_id, name):
+        self.id = job_id
+        self.name = name
+        self.status = "queued"  # queued, running, done, failed or cancelled
+        self.progress = Progress()
+        self.error = None
+        self.result = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.notified = False
+        self.future = None
+        self.cancel_event = threading.Event()
+        self.finished_event = threading.Event()
+        self.output = deque(maxlen=500)
+        self._partial_line = ""
+        self._output_lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def elapsed(self):
+        """Seconds the job has been running (or ran for)."""
+        if self.started is None:
+            return 0
+        return (self.finished or time.time()) - self.started
+
+    def progress_text(self):
+        """Short progress summary, e.g. '120/400 (30%)'."""
+        progress = self.progress
+        if progress.total:
+            return f"{progress.done}/{progress.total} ({progress.done * 100 // progress.total}%)"
+        return str(progress.done) if progress.done else "-"
+
+    def write(self, text):
+        """Collects printed output. A carriage return overwrites the current line."""
+        with self._output_lock:
+            lines = (self._partial_line + text).split("\n")
+            self._partial_line = lines.pop().rstrip("\r").rsplit("\r", 1)[-1]
+            for line in lines:
+                self.output.append(line.rstrip("\r").rsplit("\r", 1)[-1])
+
+    def output_lines(self):
+        """Returns the captured output, including an unfinished last line."""
+        with self._output_lock:
+            lines = list(self.output)
+            if self._partial_line:
+                lines.append(self._partial_line)
+        return lines
+
+class JobOutputRouter:
+    """Sends text printed on a job thread to that job instead of the console."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        job = current_job()
+        if job is None:
+            if _foreground_progress is not None and _foreground_progress.shown:
+                clear_progress_line()
+            return self.stream.write(text)
+        job.write(text)
+        return len(text)
+
+    def flush(self):
+        if current_job() is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+_job_context = threading.local()
+_job_ids = itertools.count(1)
+_job_executor = None
+_device_slots = {}
+
+def current_job():
+    """Returns the Job executing on this thread, or None on the main thread."""
+    return getattr(_job_context, "job", None)
+
+def check_cancelled(job=None):
+    """
+    Raises JobCancelled if the calling background job has been killed, or
+    KeyboardInterrupt if an attached front end pressed Ctrl+C. Worker pool
+    threads have no job of their own and pass the one they work for.
+    """
+    job = job or current_job()
+    if job is not None:
+        if job.cancel_event.is_set():
+            raise JobCancelled()
+    elif _daemon_session is not None and _daemon_session.take_interrupt():
+        raise KeyboardInterrupt()
+
+_foreground_progress = None  # Progress of the command running at the prompt
+
+def report_progress(done=None, total=None, current=None, nbytes=None, total_bytes=None):
+    """
+    Updates the progress of the calling job, or of the foreground command,
+    whose status line is redrawn at most every 'progress_interval' seconds.
+    Cheap enough to call once per item.
+    """
+    check_cancelled()
+    job = current_job()
+    progress = current_progress()
+    if done is not None:
+        progress.done = done
+    if total is not None:
+        progress.total = total
+    if current is not None:
+        progress.current = current
+    if nbytes is not None:
+        with progress.lock:
+            progress.bytes_done = nbytes
+    if total_bytes is not None:
+        progress.bytes_total = total_bytes
+    if job is None:
+        now = time.monotonic()
+        if now >= progress.next_render:
+            progress.next_render = now + float(state.get_setting("progress_interval", 0.25))
+            draw_progress_line(progress)
+
+def current_progress():
+    """
+    Returns the Progress of the calling job or foreground command. Capture it
+    on the calling thread and hand it to worker threads, which have no job
+    context of their own.
+    """
+    global _foreground_progress
+    job = current_job()
+    if job is not None:
+        return job.progress
+    if _foreground_progress is None:
+        _foreground_progress = Progress()
+    return _foreground_progress
+
+def draw_progress_line(progress):
+    """Overwrites the status line with the summary and the current item."""
+    if not isinstance(sys.stdout, JobOutputRouter):
+        sys.stdout = JobOutputRouter(sys.stdout)
+    width = get_terminal_width() - 1
+    line = progress.summary()
+    if progress.current:
+        room = width - len(line) - 2
+        current = progress.current if len(progress.current) <= room else "…" + progress.current[-(room - 1):]
+        line = f"{line}  {current}" if room > 10 else line
+    sys.stdout.stream.write("\r" + line[:width].ljust(width))
+    sys.stdout.stream.flush()
+    progress.shown = True
+
+def clear_progress_line():
+    """Removes the foreground status line so normal output starts on a clean line."""
+    if _foreground_progress is not None and _foreground_progress.shown:
+        _foreground_progress.shown = False
+        stream = sys.stdout.stream if isinstance(sys.stdout, JobOutputRouter) else sys.stdout
+        stream.write("\r" + " " * (get_terminal_width() - 1) + "\r")
+
+def reset_progress():
+    """Starts a fresh foreground progress for the next command."""
+    global _foreground_progress
+    clear_progress_line()
+    _foreground_progress = None
+
+def get_job_executor():
+    """Lazily creates the bounded worker pool used for background jobs."""
+    global _job_executor
+    if _job_executor is None:
+        workers = max(1, int(state.get_setting("max_background_jobs", 4)))
+        _job_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="selectplus-job")
+    return _job_executor
+
+def device_io_slot(path):
+    """
+    Returns the semaphore that bounds concurrent I/O on the device holding
+    'path'. Use it as a context manager around heavy reads or writes.
+    """
     try:
-        all_files = os.listdir(path)
-        if not state.show_hidden:
-            all_files = [f for f in all_files if not f.startswith('.')]
-        
-        dirs = sorted([d for d in all_files if os.path.isdir(os.path.join(path, d))], key=str.lower)
-        files = sorted([f for f in all_files if not os.path.isdir(os.path.join(path, f))], key=str.lower)
+        device = os.stat(path).st_dev
+    except OSError:
+        device = None
+    with state.lock:
+        slot = _device_slots.get(device)
+        if slot is None:
+            limit = max(1, int(state.get_setting("io_concurrency_per_device", 2)))
+            slot = threading.BoundedSemaphore(limit)
+            _device_slots[device] = slot
+    return slot
+
+def _run_job(job, func, args, kwargs):
+    """Worker-side wrapper that tracks a job's lifecycle."""
+    if job.cancel_event.is_set():
+        job.status = "cancelled"
+        job.finished_event.set()
+        return
+    _job_context.job = job
+    job.status = "running"
+    job.started = time.time()
+    job.progress.started = time.monotonic()
+    try:
+        job.result = func(*args, **kwargs)
+        job.status = "done"
+    except JobCancelled:
+        print("\n[INFO] Job cancelled.")
+        job.status = "cancelled"
+    except Exception as e:
+        print(f"\n[ERROR] {e}")
+        job.error = str(e)
+        job.status = "failed"
+    finally:
+        job.finished = time.time()
+        job.progress.ended = time.monotonic()
+        _job_context.job = None
+        job.finished_event.set()
+
+def submit_job(name, func, *args, **kwargs):
+    """Queues func(*args, **kwargs) on the worker pool and returns its Job."""
+    if not isinstance(sys.stdout, JobOutputRouter):
+        sys.stdout = JobOutputRouter(sys.stdout)
+    job = Job(next(_job_ids), name)
+    with state.lock:
+        state.background_tasks[job.id] = job
+    job.future = get_job_executor().submit(_run_job, job, func, args, kwargs)
+    return job
+
+def get_job(job_arg):
+    """Resolves a job id argument, printing an error if it is unknown."""
+    try:
+        job = state.background_tasks.get(int(job_arg.lstrip('%#')))
+    except ValueError:
+        job = None
+    if job is None:
+        print(f"[ERROR] No such job: {job_arg}")
+    return job
+
+def list_jobs():
+    """Prints a table of all background jobs."""
+    jobs = list(state.background_tasks.values())
+    if not jobs:
+        print("No background jobs.")
+        return
+    print(f"\n {'ID':<4} {'Status':<10} {'Progress':<18} {'Elapsed':>8}  Command")
+    print("-" * get_terminal_width())
+    for job in jobs:
+        print(f" {job.id:<4} {job.status:<10} {job.progress_text():<18} {format_duration(job.elapsed()):>8}  {job.name}")
+        job.notified = not job.active
+
+def show_job(job_arg, tail=20):
+    """Prints the state and the latest output of a background job."""
+    job = get_job(job_arg)
+    if job is None:
+        return
+    print(f"\n--- Job {job.id}: {job.name} ---")
+    print(f"  Status: {job.status}")
+    print(f"  Progress: {job.progress_text()}")
+    print(f"  Elapsed: {format_duration(job.elapsed())}")
+    summary = job.progress.summary()
+    if summary:
+        print(f"  Detail: {summary}")
+    if job.progress.current:
+        print(f"  Current: {job.progress.current}")
+    if job.error:
+        print(f"  Error: {job.error}")
+    lines = job.output_lines()
+    if lines:
+        print(f"  Output (last {min(tail, len(lines))} of {len(lines)} lines):")
+        for line in lines[-tail:]:
+            print(f"    {line}")
+    print("--------------------------")
+    job.notified = not job.active
+
+def kill_job(job_arg):
+    """Requests cancellation of a background job."""
+    job = get_job(job_arg)
+    if job is None:
+        return
+    if not job.active:
+        print(f"[INFO] Job {job.id} has already finished ({job.status}).")
+        return
+    job.cancel_event.set()
+    if job.future is not None and job.future.cancel():
+        job.status = "cancelled"
+        job.finished_event.set()
+    print(f"Cancellation requested for job {job.id}.")
+
+def wait_job(job_arg):
+    """Blocks until a background job finishes. Ctrl+C stops waiting."""
+    job = get_job(job_arg)
+    if job is None:
+        return
+    print(f"Waiting for job {job.id} ({job.name})... Press Ctrl+C to stop waiting.")
+    try:
+        while not job.finished_event.wait(0.5):
+            check_cancelled()
+            line = f"  {job.progress.summary() or job.progress_text()}  {format_duration(job.elapsed())}"
+            sys.stdout.write("\r" + line[:get_terminal_width() - 1].ljust(get_terminal_width() - 1))
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        print("\nStopped waiting; the job keeps running.")
+        return
+    print()
+    show_job(str(job.id))
+
+def print_job_notifications():
+    """Announces background jobs that finished since the last screen."""
+    for job in list(state.background_tasks.values()):
+        if not job.active and not job.notified:
+            job.notified = True
+            print(f"[Job {job.id} '{job.name}' {job.status} - type 'job {job.id}' for output]")
+
+def shutdown_jobs():
+    """Cancels outstanding jobs so the interpreter can exit promptly."""
+    for job in list(state.background_tasks.values()):
+        if job.active:
+            job.cancel_event.set()
+    if _job_executor is not None:
+        _job_executor.shutdown(wait=False)
+
+# --- Archive Browsing ---
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+class ArchiveEntry:
+    """One file or directory inside an archive."""
+    __slots__ = ("name", "is_dir", "size", "mtime", "info")
+
+    def __init__(self, name, is_dir, size=0, mtime=0, info=None):
+        self.name = name     # Inner path with '/' separators
+        self.is_dir = is_dir
+        self.size = size
+        self.mtime = mtime
+        self.info = info     # The ZipInfo or TarInfo describing the member
+
+def safe_member_parts(name):
+    """
+    Splits an archive member name into path parts, or returns None when it
+    is empty or could escape the destination ('..', or a drive such as
+    'C:evil' that os.path.join would honour on Windows).
+    """
+    parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".")]
+    if not parts or ".." in parts or any(ntpath.splitdrive(p)[0] for p in parts):
+        return None
+    return parts
+
+class ArchiveIndex:
+    """The directory tree of an archive, built from its zip central directory or one tar pass."""
+
+    def __init__(self, path, kind):
+        self.path = path
+        self.kind = kind  # 'zip' or 'tar'
+        self.entries = {"": ArchiveEntry("", True)}
+        self.children = {"": {}}
+
+    def add(self, name, is_dir, size=0, mtime=0, info=None):
+        parts = safe_member_parts(name)
+        if parts is None:
+            return  # Skip unsafe or empty member names
+        # Create any implicit parent directories
+        parent = ""
+        for part in parts[:-1]:
+            inner = f"{parent}/{part}" if parent else part
+            if inner not in self.entries:
+                self.entries[inner] = ArchiveEntry(inner, True, mtime=mtime)
+                self.children[inner] = {}
+                self.children[parent][part] = self.entries[inner]
+            parent = inner
+        inner = "/".join(parts)
+        existing = self.entries.get(inner)
+        if existing is not None and existing.is_dir and is_dir:
+            existing.mtime, existing.info = mtime, info
+            return
+        entry = ArchiveEntry(inner, is_dir, size, mtime, info)
+        self.entries[inner] = entry
+        self.children[parent][parts[-1]] = entry
+        if is_dir:
+            self.children.setdefault(inner, {})
+
+_archive_indexes = {}  # archive path -> (st_mtime_ns, st_size, ArchiveIndex)
+
+def is_archive_file(path):
+    """True if the path names an existing zip/tar file by extension."""
+    return path.lower().endswith(ARCHIVE_SUFFIXES) and os.path.isfile(path)
+
+def split_archive_path(path):
+    """
+    Splits a virtual path such as '/data/logs.zip/2024/app.log' into the
+    archive ('/data/logs.zip') and the inner path ('2024/app.log'). Returns
+    (None, None) for ordinary paths without touching the disk.
+    """
+    path = os.path.normpath(path)
+    lowered = path.lower()
+    if not any(suffix + os.sep in lowered or lowered.endswith(suffix) for suffix in ARCHIVE_SUFFIXES):
+        return None, None
+    head, tail = path, []
+    while True:
+        if is_archive_file(head):
+            return head, "/".join(reversed(tail))
+        if os.path.isdir(head):
+            return None, None
+        parent, name = os.path.split(head)
+        if parent == head or not name:
+            return None, None
+        tail.append(name)
+        head = parent
+
+def get_archive_index(archive_path):
+    """Returns the (cached) index of an archive, or None if it cannot be read."""
+    try:
+        st = os.stat(archive_path)
+        cached = _archive_indexes.get(archive_path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        if zipfile.is_zipfile(archive_path):
+            index = ArchiveIndex(archive_path, "zip")
+            with zipfile.ZipFile(archive_path) as zf:
+                for info in zf.infolist():
+                    index.add(info.filename, info.is_dir(), info.file_size,
+                              time.mktime(info.date_time + (0, 0, -1)), info)
+        else:
+            index = ArchiveIndex(archive_path, "tar")
+            with tarfile.open(archive_path, "r:*") as tf:
+                for info in tf:
+                    index.add(info.name, info.isdir(), info.size if info.isfile() else 0, info.mtime, info)
+        _archive_indexes[archive_path] = (st.st_mtime_ns, st.st_size, index)
+        return index
+    except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+        print(f"[ERROR] Could not read archive {os.path.basename(archive_path)}: {e}")
+        return None
+
+def resolve_archive_path(path):
+    """Returns (index, inner_path) if path lies inside an archive, else (None, None)."""
+    archive_path, inner = split_archive_path(path)
+    if archive_path is None:
+        return None, None
+    index = get_archive_index(archive_path)
+    if index is None or inner not in index.entries:
+        return None, None
+    return index, inner
+
+def get_archive_entry(path):
+    """Returns the ArchiveEntry for a member path (not the archive file itself), or None."""
+    archive_path, inner = split_archive_path(path)
+    if archive_path is None or inner == "":
+        return None  # Not inside an archive: never index one just to list or inspect it
+    index, inner = resolve_archive_path(path)
+    if index is None:
+        return None
+    return index.entries[inner]
+
+def is_archive_directory(path):
+    """True for an archive file or a directory inside one."""
+    index, inner = resolve_archive_path(path)
+    return index is not None and index.entries[inner].is_dir
+
+def extract_archive_member(source_path, dest_path):
+    """
+    Streams a file or directory out of an archive to dest_path without
+    temporary files. Directories from a tar are extracted in one sequential
+    pass; single members seek straight to their data.
+    """
+    index, inner = resolve_archive_path(source_path)
+    if index is None:
+        raise FileNotFoundError(source_path)
+    entry = index.entries[inner]
+    prefix = f"{inner}/" if inner else ""
+
+    def target_for(name):
+        if not entry.is_dir:
+            return dest_path
+        parts = safe_member_parts(name[len(prefix):])
+        if parts is None:
+            raise ValueError(f"Unsafe member name in archive: {name}")
+        return os.path.join(dest_path, *parts)
 
+    def write_member(stream, target, mtime):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as out:
+            shutil.copyfileobj(stream, out, 1024 * 1024)
+        os.utime(target, (mtime, mtime))
+
+    if entry.is_dir:
+        os.makedirs(dest_path, exist_ok=True)
+    if index.kind == "zip":
+        with zipfile.ZipFile(index.path) as zf:
+            members = [e for e in index.entries.values() if e.name.startswith(prefix) and e.info is not None] if entry.is_dir else [entry]
+            for member in members:
+                check_cancelled()
+                target = target_for(member.name)
+                if member.is_dir:
+                    os.makedirs(target, exist_ok=True)
+                    continue
+                with zf.open(member.info) as stream:
+                    write_member(stream, target, member.mtime)
+    else:
+        with tarfile.open(index.path, "r:*") as tf:
+            infos = tf if entry.is_dir else [entry.info]
+            for info in infos:
+                check_cancelled()
+                name = index.entries.get("/".join(p for p in info.name.split("/") if p not in ("", ".")))
+                if name is None or (entry.is_dir and not name.name.startswith(prefix)):
+                    continue
+                target = target_for(name.name)
+                if info.isdir():
+                    os.makedirs(target, exist_ok=True)
+                elif info.isfile():
+                    stream = tf.extractfile(info)
+                    write_member(stream, target, info.mtime)
+                else:
+                    print(f"[WARN] Skipping link or special member: {info.name}")
+
+def show_archive_entry_info(item_path, entry):
+    """Prints the info block for a member inside an archive."""
+    index, _ = resolve_archive_path(item_path)
+    print(f"  Full Path: {item_path}")
+    print(f"  Type: {'Directory' if entry.is_dir else 'File'} (in {index.kind} archive)")
+    if entry.is_dir:
+        files = [e for e in index.entries.values() if not e.is_dir and e.name.startswith(entry.name + "/")]
+        print(f"  Size (recursive): {format_size(sum(e.size for e in files))} in {len(files):,} file(s)")
+    else:
+        print(f"  Size: {format_size(entry.size)}")
+        if isinstance(entry.info, zipfile.ZipInfo):
+            print(f"  Compressed: {format_size(entry.info.compress_size)}")
+    if entry.mtime:
+        print(f"  Modified: {datetime.fromtimestamp(entry.mtime).strftime('%Y-%m-%d %H:%M:%S')}")
+
+def archive_is_read_only(path):
+    """Prints an error and returns True when path is inside an archive."""
+    if split_archive_path(path)[0] is not None:
+        print("[ERROR] Archives are read-only. Copy items out with copy/paste.")
+        return True
+    return False
+
+# --- Guarded Directory I/O ---
+#
+# Directory reads run on daemon threads so a hung network mount can only
+# stall its own request. The caller waits up to 'listing_timeout' seconds
+# (showing a stall indicator after 'stall_notice_delay'), then carries on
+# with whatever has arrived. A read that timed out keeps running; later
+# requests for the same path pick up its progress instead of piling up
+# more stuck threads.
+
+class GuardedTask:
+    """A generator drained on a daemon thread, collecting items as they arrive."""
+
+    def __init__(self, key, func, args):
+        self.key = key
+        self.items = []
+        self.error = None
+        self.cancelled = False
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(func, args), daemon=True)
+
+    def _run(self, func, args):
+        try:
+            for item in func(*args):
+                if self.cancelled:
+                    break
+                self.items.append(item)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+_guarded_tasks = {}  # key -> GuardedTask that timed out and is still running
+_guarded_lock = threading.Lock()
+
+def run_guarded(key, label, func, *args):
+    """
+    Runs generator func(*args) on a daemon thread. Returns (items, notice):
+    notice is None when it finished, else why the items are partial. Errors
+    raised by func are re-raised here.
+    """
+    timeout = float(state.get_setting("listing_timeout", 5))
+    with _guarded_lock:
+        task = _guarded_tasks.get(key)
+        if task is None:
+            task = GuardedTask(key, func, args)
+            task.thread.start()
+        else:
+            timeout = min(timeout, 1.0)  # Already waited on this once; do not freeze again
+    deadline = time.time() + timeout
+    notice_at = time.time() + float(state.get_setting("stall_notice_delay", 1.0))
+    indicator = False
+    notice = None
+    try:
+        while not task.done.wait(0.1):
+            check_cancelled()
+            now = time.time()
+            if now >= deadline:
+                notice = f"{label} is not responding; showing {len(task.items)} item(s) so far. Refresh to keep waiting."
+                with _guarded_lock:
+                    _guarded_tasks[key] = task
+                break
+            if now >= notice_at and current_job() is None:
+                sys.stdout.write(f"\r[slow] Waiting for {label}: {len(task.items)} so far, "
+                                 f"{deadline - now:.0f}s left (Ctrl+C to stop)... ")
+                sys.stdout.flush()
+                indicator = True
+    except KeyboardInterrupt:
+        task.cancelled = True
+        notice = f"{label}: stopped after {len(task.items)} item(s)."
+    finally:
+        if indicator:
+            sys.stdout.write("\r" + " " * (get_terminal_width() - 1) + "\r")
+    if task.done.is_set():
+        with _guarded_lock:
+            _guarded_tasks.pop(key, None)
+        if task.error is not None and not task.cancelled:
+            raise task.error
+    return list(task.items), notice
+
+def _iter_directory(path):
+    """Yields (name, is_dir) using scandir's cached type, so no per-entry stat is needed."""
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            yield entry.name, is_dir
+
+# --- Listing Cache & Prefetch ---
+
+class NameIndex:
+    """Sorted names of one cached listing: exact and prefix lookups by bisection."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        pairs = sorted(entries)
+        self.names = [name for name, _ in pairs]
+        self.is_dir = [is_dir for _, is_dir in pairs]
+
+    def lookup(self, name):
+        """Returns is_dir for a listed name, or None if it is not listed."""
+        i = bisect.bisect_left(self.names, name)
+        if i < len(self.names) and self.names[i] == name:
+            return self.is_dir[i]
+        return None
+
+    def with_prefix(self, prefix):
+        """Returns (name, is_dir) for every listed name starting with prefix."""
+        start = bisect.bisect_left(self.names, prefix)
+        end = bisect.bisect_left(self.names, prefix + "\U0010ffff", start)
+        return list(zip(self.names[start:end], self.is_dir[start:end]))
+
+class ListingCache:
+    """
+    LRU cache of directory listings, bounded by an estimate of their memory.
+    A listing is reused only while the directory's mtime is unchanged and
+    was already in the past when it was read: like git's racy-clean rule,
+    a change within the same timestamp tick cannot then be missed.
+    """
+
+    RACY_WINDOW_NS = 2 * 10**9  # FAT and some network shares keep 2-second mtimes
+
+    def __init__(self):
+        self.entries = OrderedDict()  # path -> (mtime_ns, read_ns, entries, cost)
+        self.indexes = {}  # path -> NameIndex, built on first lookup
+        self.bytes = 0
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, st):
+        with self.lock:
+            cached = self.entries.get(path)
+            if cached and cached[0] == st.st_mtime_ns and cached[1] - cached[0] > self.RACY_WINDOW_NS:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return cached[2]
+            self.misses += 1
+            return None
+
+    def peek(self, path):
+        """Returns the cached entries without validating them, or None."""
+        with self.lock:
+            cached = self.entries.get(path)
+            return cached[2] if cached else None
+
+    def put(self, path, st, read_ns, entries):
+        cost = 200 + sum(80 + len(name) for name, _ in entries)
+        limit = float(state.get_setting("listing_cache_mb", 32)) * 1024 * 1024
+        with self.lock:
+            old = self.entries.pop(path, None)
+            self.indexes.pop(path, None)
+            if old:
+                self.bytes -= old[3]
+            if cost > limit:
+                return
+            self.entries[path] = (st.st_mtime_ns, read_ns, entries, cost)
+            self.bytes += cost
+            while self.bytes > limit:
+                evicted_path, evicted = self.entries.popitem(last=False)
+                self.indexes.pop(evicted_path, None)
+                self.bytes -= evicted[3]
+
+    def name_index(self, path):
+        """Returns a NameIndex over the cached (unvalidated) listing of path, or None."""
+        with self.lock:
+            cached = self.entries.get(path)
+            if cached is None:
+                return None
+            index = self.indexes.get(path)
+            if index is None:
+                index = self.indexes[path] = NameIndex(cached[2])
+            return index
+
+    def __contains__(self, path):
+        return path in self.entries
+
+_listing_cache = ListingCache()
+
+def name_is_listed(name):
+    """
+    True/False from the cached listing of the current directory, or None when
+    it is not cached, so name arguments resolve without re-listing and sorting.
+    """
+    if not state.show_hidden and name.startswith('.'):
+        return False
+    index = _listing_cache.name_index(state.current_directory)
+    if index is None:
+        return None
+    return index.lookup(name) is not None
+
+def _iter_directory_cached(path):
+    """Like _iter_directory, but served from the listing cache while the directory is unchanged."""
+    st = os.stat(path)
+    cached = _listing_cache.get(path, st)
+    if cached is not None:
+        yield from cached
+        return
+    read_ns = time.time_ns()
+    entries = []
+    for entry in _iter_directory(path):
+        entries.append(entry)
+        yield entry
+    _listing_cache.put(path, st, read_ns, entries)  # Only complete listings are cached
+
+class Prefetcher:
+    """
+    Lists the directories the user is likely to open next on a few daemon
+    threads while the prompt is idle. Each new screen replaces the queue, so
+    stale guesses are dropped; a hung mount only ties up one worker.
+    """
+
+    def __init__(self):
+        self.queue = deque()
+        self.wakeup = threading.Condition()
+        self.workers = []
+
+    def schedule(self, paths):
+        with self.wakeup:
+            self.queue = deque(paths)
+            count = max(1, int(state.get_setting("prefetch_workers", 2)))
+            while len(self.workers) < count:
+                worker = threading.Thread(target=self._work, daemon=True)
+                worker.start()
+                self.workers.append(worker)
+            self.wakeup.notify_all()
+
+    def _work(self):
+        while True:
+            with self.wakeup:
+                while not self.queue:
+                    self.wakeup.wait()
+                path = self.queue.popleft()
+            if ("list", path) in _guarded_tasks:
+                continue  # Already stuck on this path
+            try:
+                for _ in _iter_directory_cached(path):
+                    pass
+            except OSError:
+                pass
+
+_prefetcher = Prefetcher()
+
+def prefetch_neighbours():
+    """Queues the visible subdirectories, the parent and the history neighbours of the current directory."""
+    if not state.get_setting("prefetch", True):
+        return
+    current = state.current_directory
+    entries = _listing_cache.peek(current)
+    if entries is None or resolve_archive_path(current)[0] is not None:
+        return
+    limit = int(state.get_setting("prefetch_limit", 50))
+    candidates = [os.path.dirname(current)]
+    pos = state.history_position
+    candidates += [state.history[i] for i in (pos - 1, pos + 1) if 0 <= i < len(state.history)]
+    candidates += [os.path.join(current, name) for name, is_dir in entries
+                   if is_dir and (state.show_hidden or not name.startswith('.'))][:limit]
+    _prefetcher.schedule(p for p in dict.fromkeys(candidates) if p != current)
+
+def get_directory_contents(path):
+    """Gets and sorts the contents of a directory."""
+    index, inner = resolve_archive_path(path)
+    if index is not None:
+        children = index.children.get(inner, {})
+        names = [n for n in children if state.show_hidden or not n.startswith('.')]
+        dirs = sorted([n for n in names if children[n].is_dir], key=str.lower)
+        files = sorted([n for n in names if not children[n].is_dir], key=str.lower)
         return dirs, files
+    try:
+        entries, notice = run_guarded(("list", path), path, _iter_directory_cached, path)
     except PermissionError:
         print("\n[ERROR] Permission denied.")
         return [], []
     except FileNotFoundError:
         print("\n[ERROR] Directory not found.")
         return [], []
+    except OSError as e:
+        print(f"\n[ERROR] Could not list directory: {e}")
+        return [], []
+    if path == state.current_directory:
+        state.listing_notice = notice
+    if not state.show_hidden:
+        entries = [e for e in entries if not e[0].startswith('.')]
+    dirs = sorted([name for name, is_dir in entries if is_dir], key=str.lower)
+    files = sorted([name for name, is_dir in entries if not is_dir], key=str.lower)
+    return dirs, files
 
-def get_item_properties(item_path):
-    """Gets properties (size, modification date) for a file or directory."""
+def _item_properties(item_path):
+    """Gets (size, modification date, type) for one item without any timeout guard."""
     try:
         stat = os.stat(item_path)
         mod_time = datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M')
         if os.path.isdir(item_path):
             if state.get_setting('fast_dir_size', True):
-                return 'DIR', mod_time
+                return 'DIR', mod_time, 'Folder'
             size = get_directory_size(item_path)
-            return format_size(size), mod_time
+            return format_size(size), mod_time, 'Folder'
         else:
-            return format_size(stat.st_size), mod_time
+            if state.get_setting('type_column', False):
+                kind = sniff_type(item_path, stat)[0]
+            else:
+                # Listings do not open files; show a type only if find or info already sniffed it
+                cached = _type_cache.lookup(stat)
+                kind = cached[0] if cached else 'File'
+            return format_size(stat.st_size), mod_time, kind
     except (FileNotFoundError, PermissionError):
-        return 'N/A', 'N/A'
+        return 'N/A', 'N/A', 'N/A'
+
+def get_items_properties(item_paths):
+    """Gets properties for several items with one guarded read; items that did not answer get '?'."""
+    results = [None] * len(item_paths)
+    pending = []
+    for i, item_path in enumerate(item_paths):
+        entry = get_archive_entry(item_path)
+        if entry is not None:
+            mod_time = datetime.fromtimestamp(entry.mtime).strftime('%Y-%m-%d %H:%M') if entry.mtime else 'N/A'
+            results[i] = ('DIR' if entry.is_dir else format_size(entry.size)), mod_time, ('Folder' if entry.is_dir else 'File')
+        else:
+            pending.append(i)
+    if pending:
+        paths = [item_paths[i] for i in pending]
+        key = ("stat", tuple(paths))
+        try:
+            found, _ = run_guarded(key, os.path.dirname(paths[0]) or paths[0], lambda: map(_item_properties, paths))
+        except OSError:
+            found = []
+        for i, props in zip(pending, found):
+            results[i] = props
+    return [props or ('?', '?', '?') for props in results]
+
+def get_item_properties(item_path):
+    """Gets properties (size, modification date, type) for a file or directory."""
+    return get_items_properties([item_path])[0]
+
+def path_is_directory(path):
+    """os.path.isdir that gives up (returning None) when the path does not answer in time."""
+    try:
+        found, _ = run_guarded(("isdir", path), path, lambda: iter([os.path.isdir(path)]))
+    except OSError:
+        return False
+    if not found:
+        print(f"[ERROR] {path} is not responding.")
+        return None
+    return found[0]
 
 def get_directory_size(path):
     """Recursively calculates the size of a directory."""
@@ -214,6 +1277,299 @@ def get_directory_size(path):
         return None
     return total_size
 
+# --- Content Type Sniffing ---
+
+SNIFF_BYTES = 512  # One read; enough for the tar header magic at offset 257
+
+MAGIC_SIGNATURES = [  # (offset, magic bytes, kind, format)
+    (0, b"\x89PNG\r\n\x1a\n", "image", "PNG"),
+    (0, b"\xff\xd8\xff", "image", "JPEG"),
+    (0, b"GIF87a", "image", "GIF"),
+    (0, b"GIF89a", "image", "GIF"),
+    (0, b"II*\x00", "image", "TIFF"),
+    (0, b"MM\x00*", "image", "TIFF"),
+    (0, b"8BPS", "image", "PSD"),
+    (0, b"\x00\x00\x01\x00", "image", "ICO"),
+    (0, b"ID3", "audio", "MP3"),
+    (0, b"fLaC", "audio", "FLAC"),
+    (0, b"OggS", "audio", "Ogg"),
+    (0, b"MThd", "audio", "MIDI"),
+    (0, b"\x1a\x45\xdf\xa3", "video", "Matroska/WebM"),
+    (0, b"FLV\x01", "video", "FLV"),
+    (0, b"\x00\x00\x01\xba", "video", "MPEG-PS"),
+    (0, b"%PDF", "document", "PDF"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "document", "OLE (Office)"),
+    (0, b"PK\x03\x04", "archive", "ZIP"),
+    (0, b"PK\x05\x06", "archive", "ZIP"),
+    (0, b"\x1f\x8b", "archive", "gzip"),
+    (0, b"BZh", "archive", "bzip2"),
+    (0, b"\xfd7zXZ\x00", "archive", "xz"),
+    (0, b"(\xb5/\xfd", "archive", "zstd"),
+    (0, b"7z\xbc\xaf\x27\x1c", "archive", "7z"),
+    (0, b"Rar!\x1a\x07", "archive", "RAR"),
+    (257, b"ustar", "archive", "tar"),
+    (0, b"\x7fELF", "program", "ELF"),
+    (0, b"MZ", "program", "PE"),
+    (0, b"\xcf\xfa\xed\xfe", "program", "Mach-O"),
+    (0, b"\xca\xfe\xba\xbe", "program", "Mach-O/Java"),
+    (0, b"SQLite format 3\x00", "database", "SQLite"),
+]
+
+CONTENT_KINDS = {"image", "audio", "video", "document", "archive", "program", "database", "text", "empty", "data"}
+RIFF_FORMATS = {b"WAVE": ("audio", "WAV"), b"AVI ": ("video", "AVI"), b"WEBP": ("image", "WebP")}
+IMAGE_BRANDS = (b"heic", b"heix", b"mif1", b"msf1", b"avif")
+AUDIO_BRANDS = (b"M4A ", b"M4B ")
+TEXT_BOMS = [  # Longest first: the UTF-32 LE mark starts with the UTF-16 LE one
+    (b"\xff\xfe\x00\x00", "UTF-32 LE"),
+    (b"\x00\x00\xfe\xff", "UTF-32 BE"),
+    (b"\xef\xbb\xbf", "UTF-8"),
+    (b"\xff\xfe", "UTF-16 LE"),
+    (b"\xfe\xff", "UTF-16 BE"),
+]
+
+def _mpeg_audio_header(head):
+    """True if head starts with a plausible MPEG audio or ADTS (AAC) frame header."""
+    if len(head) < 4 or head[0] != 0xFF or head[1] & 0xE0 != 0xE0:
+        return False
+    version, layer = (head[1] >> 3) & 3, (head[1] >> 1) & 3
+    if layer == 0:  # ADTS: MPEG-2/4 ID bit set, valid sampling frequency index
+        return head[1] & 0xF6 == 0xF0 and (head[2] >> 2) & 0xF < 13
+    bitrate, sample_rate = head[2] >> 4, (head[2] >> 2) & 3
+    return version != 1 and bitrate not in (0, 15) and sample_rate != 3
+
+def sniff_bytes(head):
+    """Classifies a file from its first bytes. Returns (kind, format)."""
+    if not head:
+        return "empty", "Empty"
+    for bom, encoding in TEXT_BOMS:  # Before the magic table: FF FE would also pass as an MPEG frame sync
+        if head.startswith(bom):
+            return "text", f"Text ({encoding})"
+    for offset, magic, kind, name in MAGIC_SIGNATURES:
+        if head.startswith(magic, offset):
+            return kind, name
+    if head[:2] == b"BM" and head[6:10] == b"\x00\x00\x00\x00":
+        return "image", "BMP"  # Two-byte magic: also require the zeroed reserved fields
+    if head[:4] == b"RIFF" and head[8:12] in RIFF_FORMATS:
+        return RIFF_FORMATS[head[8:12]]
+    if head[4:8] == b"ftyp":  # ISO base media: MP4, MOV, M4A, HEIC, AVIF
+        brand = head[8:12]
+        if brand in IMAGE_BRANDS:
+            return "image", brand.decode().strip().upper()
+        if brand in AUDIO_BRANDS:
+            return "audio", "MPEG-4 audio"
+        return "video", "QuickTime" if brand == b"qt  " else "MPEG-4"
+    if len(head) > 188 and head[0] == 0x47 and head[188] == 0x47:
+        return "video", "MPEG-TS"
+    if _mpeg_audio_header(head):
+        return "audio", "MPEG audio"  # MP3/AAC frame sync without an ID3 tag
+    if b"\x00" not in head:
+        try:
+            head.decode("utf-8")
+            return "text", "Text"
+        except UnicodeDecodeError as e:
+            if e.start >= len(head) - 3:
+                return "text", "Text"  # Multi-byte character cut off by the sample
+    return "data", "Data"
+
+class TypeCache:
+    """Sniffed types keyed by (device, inode), reused while size and mtime are unchanged."""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # (st_dev, st_ino) -> (mtime_ns, size, kind, format)
+        self.lock = threading.Lock()
+
+    def lookup(self, st):
+        """Returns the cached (kind, format) for a stat result if still current, else None."""
+        key = (st.st_dev, st.st_ino)
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                self.entries.move_to_end(key)
+                return cached[2], cached[3]
+        return None
+
+    def sniff(self, path, st=None):
+        """Returns (kind, format) for a regular file, reading at most SNIFF_BYTES of it."""
+        st = st or os.stat(path)
+        cached = self.lookup(st)
+        if cached:
+            return cached
+        with open(path, "rb") as f:
+            kind, name = sniff_bytes(f.read(SNIFF_BYTES))
+        limit = int(state.get_setting("type_cache_entries", 200000))
+        with self.lock:
+            self.entries[(st.st_dev, st.st_ino)] = (st.st_mtime_ns, st.st_size, kind, name)
+            while len(self.entries) > limit:
+                self.entries.popitem(last=False)
+        return kind, name
+
+_type_cache = TypeCache()
+
+def sniff_type(path, st=None):
+    """(kind, format) of a file from its magic bytes; ('data', 'Unreadable') if it cannot be read."""
+    try:
+        return _type_cache.sniff(path, st)
+    except OSError:
+        return "data", "Unreadable"
+
+# --- Directory Jump ---
+
+class FrecencyIndex:
+    """
+    Every directory the user has entered, ranked by frequency and recency
+    (the scheme of z/zoxide) and saved to config/frecency.tsv. For matching,
+    all known paths are joined into one lower-case text so a single compiled
+    regex scan finds the candidates, and only those are scored.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.ranks = {}       # path -> [rank, last visit]
+        self.loaded = False
+        self.dirty = False
+        self._text = None     # Joined lower-case paths, rebuilt when paths are added or removed
+        self._by_lower = {}
+        self.lock = threading.Lock()
+
+    def _load(self):
+        self.loaded = True
+        try:
+            with open(self.filepath, encoding="utf-8", errors="surrogateescape") as f:
+                for line in f:
+                    rank, last, path = line.rstrip("\n").split("\t", 2)
+                    self.ranks[path] = [float(rank), float(last)]
+        except (OSError, ValueError):
+            pass
+
+    def record(self, path):
+        with self.lock:
+            if not self.loaded:
+                self._load()
+            entry = self.ranks.get(path)
+            if entry is None:
+                self.ranks[path] = [1.0, time.time()]
+                self._text = None
+            else:
+                entry[0] += 1
+                entry[1] = time.time()
+            max_total = float(state.get_setting("frecency_max_total", 10000))
+            if sum(rank for rank, _ in self.ranks.values()) > max_total:
+                # Age everything so old favourites fade; forget what drops below 1
+                for key in list(self.ranks):
+                    self.ranks[key][0] *= 0.9
+                    if self.ranks[key][0] < 1:
+                        del self.ranks[key]
+                self._text = None
+            self.dirty = True
+
+    def forget(self, path):
+        with self.lock:
+            if self.ranks.pop(path, None) is not None:
+                self._text = None
+                self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            partial = self.filepath + ".partial"
+            try:
+                with open(partial, "w", encoding="utf-8", errors="surrogateescape", newline="\n") as f:
+                    for path, (rank, last) in self.ranks.items():
+                        f.write(f"{rank:.3f}\t{last:.0f}\t{path}\n")
+                os.replace(partial, self.filepath)
+                self.dirty = False
+            except OSError as e:
+                print(f"[WARN] Could not save the directory index: {e}")
+
+    @staticmethod
+    def score(rank, last, now):
+        age = now - last
+        if age < 3600:
+            return rank * 4
+        if age < 86400:
+            return rank * 2
+        if age < 7 * 86400:
+            return rank * 0.5
+        return rank * 0.25
+
+    def _pattern(self, keywords, fuzzy):
+        """Keywords must appear in order, the last one in the final path component."""
+        sep = re.escape(os.sep) + ("/" if os.sep != "/" else "")
+        if fuzzy:
+            # c1[^\nc2]*c2... matches the same subsequences as c1.*?c2 without backtracking
+            parts = ["".join((f"[^\n{re.escape(c)}]*" if i else "") + re.escape(c) for i, c in enumerate(k))
+                     for k in keywords]
+        else:
+            parts = [re.escape(k) for k in keywords]
+        # Unanchored so the regex engine can skip ahead to the first keyword literal
+        return re.compile("[^\n]*".join(parts) + f"[^\n{sep}]*$", re.MULTILINE)
+
+    def query(self, keywords, limit=50):
+        """Returns up to limit matching paths, best first; falls back to fuzzy (subsequence) matching."""
+        with self.lock:
+            if not self.loaded:
+                self._load()
+            now = time.time()
+            key = lambda p: self.score(*self.ranks[p], now)
+            keywords = [k.lower() for k in keywords if k]
+            if not keywords:
+                return heapq.nlargest(limit, self.ranks, key=key)
+            if self._text is None:
+                self._by_lower = {}
+                for path in self.ranks:
+                    self._by_lower.setdefault(path.lower(), path)
+                self._text = "\n".join(self._by_lower)
+            text = self._text
+            for fuzzy in (False, True):
+                matches = []
+                for m in self._pattern(keywords, fuzzy).finditer(text):
+                    start = text.rfind("\n", 0, m.start()) + 1
+                    matches.append(self._by_lower[text[start:m.end()]])
+                if matches:
+                    return heapq.nlargest(limit, dict.fromkeys(matches), key=key)
+            return []
+
+_frecency = FrecencyIndex(get_config_path("frecency.tsv"))
+
+def visit_directory(path):
+    """Makes path the current directory, recording it in the (bounded) history and the jump index."""
+    state.current_directory = os.path.normpath(path)
+    if state.history[-1] != state.current_directory:
+        state.history.append(state.current_directory)
+        limit = max(2, int(state.get_setting("history_limit", 50)))
+        del state.history[:-limit]
+    state.history_position = len(state.history) - 1
+    state.selection.clear()
+    if resolve_archive_path(state.current_directory)[0] is None:
+        _frecency.record(state.current_directory)
+
+def jump_command(args):
+    """Handles 'j <keywords>' (jump to the best match) and 'j -l [keywords]' (list matches)."""
+    listing = bool(args) and args[0] == "-l"
+    keywords = args[1:] if listing else args
+    if not keywords:
+        listing = True
+    matches = _frecency.query(keywords)
+    if listing:
+        if not matches:
+            print("[INFO] No matching directories. Directories are learned as you enter them.")
+        now = time.time()
+        for n, path in enumerate(matches[:20], 1):
+            print(f"  {n:>2}. {FrecencyIndex.score(*_frecency.ranks[path], now):>8.1f}  {path}")
+        return True
+    for path in matches:
+        if path == state.current_directory:
+            continue
+        is_dir = path_is_directory(path)
+        if is_dir:
+            visit_directory(path)
+            return False
+        if is_dir is False:
+            _frecency.forget(path)  # Gone; drop it so it stops matching
+    print(f"[ERROR] No known directory matches '{' '.join(keywords)}'.")
+    return True
+
 # --- Display Functions ---
 
 def display_columns():
@@ -238,7 +1594,7 @@ def display_columns():
             if index < len(items):
                 item = items[index]
                 display_index = index + 1
-                is_dir = os.path.isdir(os.path.join(state.current_directory, item))
+                is_dir = index < len(dirs)
                 indicator = " [D]" if is_dir else ""
                 
                 # Truncate if necessary
@@ -264,16 +1620,16 @@ def display_list():
     # Prepare data for display
     display_data = []
     max_name_len = 0
+    properties = get_items_properties([os.path.join(state.current_directory, item) for item in items])
     for i, item in enumerate(items):
-        item_path = os.path.join(state.current_directory, item)
-        size, mod_time = get_item_properties(item_path)
+        size, mod_time, kind = properties[i]
         is_dir = size == 'DIR'
         
         display_data.append({
             "index": i + 1,
             "name": item,
             "size": "—" if is_dir else size,
-            "type": "Folder" if is_dir else "File",
+            "type": kind,
             "modified": mod_time,
             "is_dir": is_dir
         })
@@ -282,7 +1638,7 @@ def display_list():
     
     # Calculate column widths
     size_col_width = max(len(d['size']) for d in display_data) if display_data else 5
-    type_col_width = 7 # "Folder"
+    type_col_width = max(6, max(len(d['type']) for d in display_data)) # At least "Folder"
     mod_col_width = 17 # YYYY-MM-DD HH:MM
     
     # Header
@@ -312,7 +1668,11 @@ def refresh_display():
     else:
         display_list()
     print("\n" + "-" * get_terminal_width())
+    if state.listing_notice:
+        print(f"[WARN] {state.listing_notice}")
+    print_job_notifications()
     print("Type 'help' for a list of commands.")
+    prefetch_neighbours()
 
 # --- File Operations ---
 
@@ -334,19 +1694,21 @@ def change_directory(target):
     else:
         new_path = os.path.join(state.current_directory, target)
 
-    if os.path.isdir(new_path):
+    if is_archive_directory(new_path):
+        # Browse the archive as a virtual directory
+        visit_directory(new_path)
+        return
+    is_dir = path_is_directory(new_path)
+    if is_dir:
         try:
             # Test if we can list the directory before changing
-            os.listdir(new_path)
-            state.current_directory = os.path.normpath(new_path)
-            # Update history
-            if state.history[-1] != state.current_directory:
-                state.history.append(state.current_directory)
-            state.history_position = len(state.history) - 1
-            state.selection.clear()
+            run_guarded(("list", new_path), new_path, _iter_directory_cached, new_path)
+            visit_directory(new_path)
         except PermissionError:
             print("[ERROR] Permission denied.")
-    else:
+        except OSError as e:
+            print(f"[ERROR] Cannot open directory: {e}")
+    elif is_dir is False:
         print(f"[ERROR] Directory not found: {new_path}")
 
 def handle_selection(args):
@@ -388,39 +1750,66 @@ def handle_selection(args):
         except (ValueError, IndexError):
             print(f"[ERROR] Invalid index or range: {arg}")
 
+def prompt_input(prompt):
+    """input() that asks the attached front end when running inside the daemon."""
+    if _daemon_session is not None:
+        return _daemon_session.ask(prompt)
+    return input(prompt)
+
 def confirm_action(prompt):
     """Asks for user confirmation if the setting is enabled."""
     if not state.get_setting("show_confirmation", True):
         return True
     
-    response = input(f"{prompt} (y/n): ").lower()
+    response = prompt_input(f"{prompt} (y/n): ").lower()
     return response == 'y'
 
-def delete_selected():
+def delete_selected(background=False):
     """Deletes selected files and directories."""
     if not state.selection:
         print("[ERROR] No items selected to delete.")
         return
 
-    if not confirm_action(f"Permanently delete {len(state.selection)} item(s)?"):
+    if archive_is_read_only(state.current_directory):
+        return
+
+    use_trash = state.get_setting("use_trash", True)
+    prompt = f"Delete {len(state.selection)} item(s)? ('undo' restores them until purged)" if use_trash \
+        else f"Permanently delete {len(state.selection)} item(s)?"
+    if not confirm_action(prompt):
         print("Deletion cancelled.")
         return
-    
-    for item_name in state.selection:
-        item_path = os.path.join(state.current_directory, item_name)
-        try:
-            if os.path.isdir(item_path):
-                shutil.rmtree(item_path)
+
+    paths = [os.path.join(state.current_directory, item_name) for item_name in state.selection]
+    state.selection.clear()
+    if use_trash:
+        trash_items(paths)  # Renames are instant; the purge runs in the background anyway
+    elif background:
+        job = submit_job(f"del {len(paths)} item(s)", delete_items, paths)
+        print(f"Started job {job.id}: deleting {len(paths)} item(s).")
+    else:
+        delete_items(paths)
+
+def delete_items(paths):
+    """Deletes the given files and directories."""
+    for i, item_path in enumerate(paths):
+        item_name = os.path.basename(item_path)
+        report_progress(i, len(paths), item_path)
+        try:
+            if os.path.isdir(item_path):
+                shutil.rmtree(item_path)
                 print(f"Deleted directory: {item_name}")
             else:
                 os.remove(item_path)
                 print(f"Deleted file: {item_name}")
         except Exception as e:
             print(f"[ERROR] Could not delete {item_name}: {e}")
-    state.selection.clear()
+    report_progress(len(paths))
 
 def create_item(item_type, name):
     """Creates a new file or directory."""
+    if archive_is_read_only(state.current_directory):
+        return
     item_path = os.path.join(state.current_directory, name)
     if os.path.exists(item_path):
         print(f"[ERROR] '{name}' already exists.")
@@ -438,21 +1827,26 @@ def create_item(item_type, name):
 
 def rename_item(old_name_arg, new_name):
     """Renames a file or directory."""
-    dirs, files = get_directory_contents(state.current_directory)
-    items = dirs + files
-
-    try:
-        # Try to resolve by index first
-        index = int(old_name_arg) - 1
-        if not (0 <= index < len(items)):
-            raise ValueError()
-        old_name = items[index]
-    except (ValueError, IndexError):
-        # Fallback to resolving by name
+    if archive_is_read_only(state.current_directory):
+        return
+    if not old_name_arg.isdigit() and name_is_listed(old_name_arg):
         old_name = old_name_arg
-        if old_name not in items:
-            print(f"[ERROR] Item '{old_name}' not found.")
-            return
+    else:
+        dirs, files = get_directory_contents(state.current_directory)
+        items = dirs + files
+
+        try:
+            # Try to resolve by index first
+            index = int(old_name_arg) - 1
+            if not (0 <= index < len(items)):
+                raise ValueError()
+            old_name = items[index]
+        except (ValueError, IndexError):
+            # Fallback to resolving by name
+            old_name = old_name_arg
+            if old_name not in items:
+                print(f"[ERROR] Item '{old_name}' not found.")
+                return
 
     old_path = os.path.join(state.current_directory, old_name)
     new_path = os.path.join(state.current_directory, new_name)
@@ -473,238 +1867,3098 @@ def copy_paste_handler(mode):
         print(f"[ERROR] Nothing selected to {mode}.")
         return
 
+    if mode == 'cut' and archive_is_read_only(state.current_directory):
+        return
+
     state.clipboard = [os.path.join(state.current_directory, item) for item in state.selection]
     state.clipboard_mode = mode
     print(f"{len(state.clipboard)} item(s) ready to be {'moved' if mode == 'cut' else 'pasted'}.")
     state.selection.clear()
 
-def paste_handler():
+def paste_handler(background=False):
     """Handles the paste operation."""
     if not state.clipboard:
         print("[ERROR] Clipboard is empty.")
         return
+    if archive_is_read_only(state.current_directory):
+        return
 
+    sources = state.clipboard
+    mode = state.clipboard_mode
     destination_dir = state.current_directory
-    print(f"Pasting {len(state.clipboard)} item(s) to {destination_dir}...")
-    
-    for source_path in state.clipboard:
-        item_name = os.path.basename(source_path)
-        dest_path = os.path.join(destination_dir, item_name)
 
-        if os.path.exists(dest_path):
-            print(f"[WARN] '{item_name}' already exists. Skipping.")
-            continue
-        
-        try:
-            if state.clipboard_mode == 'cut':
-                shutil.move(source_path, dest_path)
-                print(f"Moved: {item_name}")
-            else: # copy
-                if os.path.isdir(source_path):
-                    shutil.copytree(source_path, dest_path)
-                else:
-                    shutil.copy2(source_path, dest_path)
-                print(f"Copied: {item_name}")
-        except Exception as e:
-            print(f"[ERROR] Failed to paste '{item_name}': {e}")
-    
-    # Clear clipboard after cut
-    if state.clipboard_mode == 'cut':
-        state.clipboard.clear()
-        state.clipboard_mode = None
+    # Clear clipboard after cut
+    if mode == 'cut':
+        state.clipboard = []
+        state.clipboard_mode = None
+
+    if background:
+        job = submit_job(f"paste {len(sources)} item(s) -> {destination_dir}", paste_items, sources, mode, destination_dir)
+        print(f"Started job {job.id}: pasting {len(sources)} item(s).")
+    else:
+        paste_items(sources, mode, destination_dir)
+
+SPARSE_COPY_CHUNK = 8 * 1024 * 1024
+
+def _copy_range(src_fd, dst_fd, offset, length, progress=None):
+    """Copies length bytes at offset between two descriptors, in kernel space where possible."""
+    end = offset + length
+    while offset < end:
+        check_cancelled()
+        count = min(SPARSE_COPY_CHUNK, end - offset)
+        copied = 0
+        if hasattr(os, "copy_file_range"):
+            try:
+                copied = os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+            except OSError:
+                copied = 0  # Not supported for this pair of filesystems; fall back to read/write
+        if not copied:
+            data = os.pread(src_fd, count, offset)
+            if not data:
+                break
+            copied = os.pwrite(dst_fd, data, offset)
+        offset += copied
+        if progress is not None:
+            progress.add_bytes(copied)
+
+def copy_file_sparse(src, dst, progress=None):
+    """
+    Copies file contents, keeping holes: only the data extents reported by
+    SEEK_DATA/SEEK_HOLE are copied into a destination truncated to full
+    size, so a sparse VM image stays sparse. Dense files, and platforms
+    without SEEK_DATA, use shutil.copyfile. Copied bytes are added to
+    progress, if given.
+    """
+    st = os.stat(src)
+    blocks = getattr(st, "st_blocks", None)
+    if not hasattr(os, "SEEK_DATA") or blocks is None or blocks * 512 >= st.st_size:
+        shutil.copyfile(src, dst)
+        if progress is not None:
+            progress.add_bytes(st.st_size)
+        return
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            os.ftruncate(dst_fd, st.st_size)
+            pos = 0
+            while pos < st.st_size:
+                try:
+                    data_start = os.lseek(src_fd, pos, os.SEEK_DATA)
+                except OSError as e:
+                    if e.errno == errno.ENXIO:
+                        break  # Only a hole remains
+                    raise
+                data_end = os.lseek(src_fd, data_start, os.SEEK_HOLE)
+                _copy_range(src_fd, dst_fd, data_start, data_end - data_start, progress)
+                pos = data_end
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+def _job_copy2(src, dst, progress=None):
+    """shutil.copy2 replacement: sparse-aware, cancellable between files, and counts the bytes copied."""
+    check_cancelled()
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    copy_file_sparse(src, dst, progress)
+    shutil.copystat(src, dst)
+    return dst
+
+def same_device(path_a, path_b):
+    """True when both paths are on the same filesystem, so a rename can move between them."""
+    try:
+        return os.stat(path_a).st_dev == os.stat(path_b).st_dev
+    except OSError:
+        return False
+
+def copy_item(source_path, dest_path, progress=None):
+    """Copies a file, symlink or directory tree with the sparse-aware copy function."""
+    if os.path.islink(source_path):
+        os.symlink(os.readlink(source_path), dest_path)
+    elif os.path.isdir(source_path):
+        shutil.copytree(source_path, dest_path, symlinks=True,
+                        copy_function=lambda src, dst: _job_copy2(src, dst, progress))
+    else:
+        _job_copy2(source_path, dest_path, progress)
+
+def verify_copy(source_path, dest_path, by_content=False):
+    """Checks that dest_path holds every file of source_path with the same size (or content)."""
+    if os.path.islink(source_path):
+        return os.path.islink(dest_path) and os.readlink(dest_path) == os.readlink(source_path)
+    pairs = [(source_path, dest_path)]
+    if os.path.isdir(source_path):
+        pairs = []
+        for dirpath, _, filenames in os.walk(source_path):
+            rel = os.path.relpath(dirpath, source_path)
+            for name in filenames:
+                pairs.append((os.path.join(dirpath, name), os.path.join(dest_path, rel, name)))
+    for src, dst in pairs:
+        if os.path.islink(src):
+            if not os.path.islink(dst):
+                return False
+            continue
+        if os.path.getsize(src) != os.path.getsize(dst):
+            return False
+        if by_content and not files_identical(src, dst):
+            return False
+    return True
+
+def _finish_move(source_path, dest_path, by_content):
+    """Deletes a cross-device move's source once its copy is verified; returns a status line."""
+    item_name = os.path.basename(source_path)
+    try:
+        if not verify_copy(source_path, dest_path, by_content):
+            return f"[ERROR] Copy of '{item_name}' did not verify; the source was kept."
+        if os.path.isdir(source_path) and not os.path.islink(source_path):
+            shutil.rmtree(source_path)
+        else:
+            os.remove(source_path)
+        return f"Moved: {item_name}"
+    except OSError as e:
+        return f"[ERROR] Copied '{item_name}' but could not remove the source: {e}"
+
+def paste_items(sources, mode, destination_dir):
+    """
+    Copies or moves the source paths into destination_dir. Moves on the same
+    filesystem are renames. Across filesystems each item is copied, and its
+    source is verified and deleted on a second thread while the next item
+    copies.
+    """
+    print(f"Pasting {len(sources)} item(s) to {destination_dir}...")
+    by_content = state.get_setting("move_verify", "size") == "content"
+    progress = current_progress()
+    finishing = deque()
+
+    def report_finished(block):
+        while finishing and (block or finishing[0].done()):
+            print(finishing.popleft().result())
+
+    with ThreadPoolExecutor(max_workers=1) as finisher:
+        for i, source_path in enumerate(sources):
+            item_name = os.path.basename(source_path)
+            dest_path = os.path.join(destination_dir, item_name)
+            report_progress(i, len(sources), source_path)
+            report_finished(block=False)
+
+            if os.path.lexists(dest_path):
+                print(f"[WARN] '{item_name}' already exists. Skipping.")
+                continue
+
+            try:
+                with device_io_slot(destination_dir):
+                    if get_archive_entry(source_path) is not None:
+                        extract_archive_member(source_path, dest_path)
+                        print(f"Extracted: {item_name}")
+                        continue
+                    if mode == 'cut' and same_device(os.path.dirname(source_path), destination_dir):
+                        try:
+                            os.rename(source_path, dest_path)
+                            print(f"Moved: {item_name}")
+                            continue
+                        except OSError as e:
+                            if e.errno != errno.EXDEV:
+                                raise
+                    try:
+                        copy_item(source_path, dest_path, progress)
+                    except BaseException:
+                        # The destination did not exist before, so a partial copy can go
+                        if os.path.isdir(dest_path) and not os.path.islink(dest_path):
+                            shutil.rmtree(dest_path, ignore_errors=True)
+                        elif os.path.lexists(dest_path):
+                            os.remove(dest_path)
+                        raise
+                if mode == 'cut':
+                    finishing.append(finisher.submit(_finish_move, source_path, dest_path, by_content))
+                else:
+                    print(f"Copied: {item_name}")
+            except Exception as e:
+                print(f"[ERROR] Failed to paste '{item_name}': {e}")
+        report_finished(block=True)
+    report_progress(len(sources))
+
+# --- Trash ---
+
+TRASH_DIR_NAME = ".selectplus-trash"
+_trash_ids = itertools.count(1)
+
+class TrashBatch:
+    """Items moved to trash by one 'del', restorable until purged."""
+
+    def __init__(self, batch_dir):
+        self.id = next(_trash_ids)
+        self.dir = batch_dir
+        self.items = []      # (original path, path inside batch_dir)
+        self.created = time.time()
+        self.timer = None    # Delayed purge
+        self.purge_job = None
+        self.claimed = False # Set under state.lock by whichever of undo or purge gets the batch first
+        self.purged = False
+
+def get_trash_root(path):
+    """
+    Returns the trash directory for path on the same device: at the mount
+    point when writable, otherwise next to the item itself.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    mount = parent
+    while not os.path.ismount(mount):
+        up = os.path.dirname(mount)
+        if up == mount:
+            break
+        mount = up
+    for candidate in (os.path.join(mount, TRASH_DIR_NAME), os.path.join(parent, TRASH_DIR_NAME)):
+        try:
+            os.makedirs(candidate, exist_ok=True)
+            if os.stat(candidate).st_dev == os.stat(parent).st_dev:
+                return candidate
+        except OSError:
+            continue
+    return None
+
+def get_trash_roots_path():
+    return get_config_path("trash_roots.txt")
+
+def load_trash_roots():
+    """Returns the trash directories this installation has used, so leftovers can be swept."""
+    try:
+        with open(get_trash_roots_path(), encoding="utf-8") as f:
+            return [line.rstrip("\n") for line in f if line.strip()]
+    except OSError:
+        return []
+
+def save_trash_roots(roots):
+    try:
+        with open(get_trash_roots_path(), "w", encoding="utf-8") as f:
+            f.writelines(f"{root}\n" for root in roots)
+    except OSError as e:
+        print(f"[WARN] Could not save the trash directory list: {e}")
+
+def remove_trash_dir(batch_dir):
+    """Removes an emptied batch directory, and its trash root too once nothing else is in it."""
+    for directory in (batch_dir, os.path.dirname(batch_dir)):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            return  # Not empty (e.g. another batch still waiting) or already gone
+
+def process_alive(pid):
+    """True if a process with this id is running (used to tell live trash batches from leftovers)."""
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists but belongs to another user
+    return True
+
+def sweep_stale_trash(roots):
+    """Purges batches left in trash directories by sessions that exited or crashed before purging."""
+    remaining = []
+    for root in roots:
+        try:
+            names = os.listdir(root)
+        except FileNotFoundError:
+            continue  # Removed once it was empty
+        except OSError as e:
+            print(f"[WARN] Cannot read {root}: {e}")
+            remaining.append(root)
+            continue
+        for name in names:
+            parts = name.split("-")  # <date>-<time>-<pid>-<n>
+            if len(parts) == 4 and parts[2].isdigit() and process_alive(int(parts[2])):
+                continue
+            check_cancelled()
+            purge_trash_batch(TrashBatch(os.path.join(root, name)))
+        if os.path.isdir(root):
+            remaining.append(root)
+    with state.lock:
+        # Keep roots registered by this session while the sweep ran
+        save_trash_roots(list(dict.fromkeys(remaining + [r for r in load_trash_roots() if r not in roots])))
+
+def start_trash_sweep():
+    """Sweeps leftover trash in the background at startup; no job is started when there is none."""
+    roots = load_trash_roots()
+    if roots:
+        submit_job("sweep leftover trash", sweep_stale_trash, roots)
+
+def trash_items(paths):
+    """Deletes items by renaming them into a same-device trash directory, then schedules a purge."""
+    batches = {}  # trash root -> TrashBatch
+    fallback = []
+    for path in paths:
+        name = os.path.basename(path)
+        root = get_trash_root(path)
+        if root is None:
+            fallback.append(path)
+            continue
+        batch = batches.get(root)
+        if batch is None:
+            batch_dir = os.path.join(root, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_trash_ids)}")
+            os.makedirs(batch_dir)
+            batch = batches[root] = TrashBatch(batch_dir)
+            with state.lock:
+                roots = load_trash_roots()
+                if root not in roots:
+                    save_trash_roots(roots + [root])
+        trashed = os.path.join(batch.dir, f"{len(batch.items)}-{name}")
+        try:
+            os.rename(path, trashed)
+            batch.items.append((path, trashed))
+            print(f"Deleted: {name}")
+        except OSError:
+            fallback.append(path)
+    if fallback:
+        print(f"[WARN] {len(fallback)} item(s) cannot be moved to trash, so 'undo' could not restore them:")
+        for path in fallback[:10]:
+            print(f"  {path}")
+        if len(fallback) > 10:
+            print(f"  ... and {len(fallback) - 10} more")
+        if confirm_action(f"Delete these {len(fallback)} item(s) permanently?"):
+            delete_items(fallback)
+        else:
+            print(f"Kept {len(fallback)} item(s).")
+
+    delay = float(state.get_setting("trash_purge_delay", 300))
+    for batch in batches.values():
+        if not batch.items:
+            remove_trash_dir(batch.dir)
+            continue
+        state.trash_batches.append(batch)
+        batch.timer = threading.Timer(delay, schedule_purge, args=(batch,))
+        batch.timer.daemon = True
+        batch.timer.start()
+
+def schedule_purge(batch):
+    """Starts the background purge of a trash batch."""
+    with state.lock:
+        if batch.claimed:
+            return
+        batch.claimed = True
+        if batch.timer is not None:
+            batch.timer.cancel()
+    batch.purge_job = submit_job(f"purge trash ({len(batch.items)} item(s))", purge_trash_batch, batch)
+
+def _unlink_files(directory, filenames):
+    """Removes the files of one directory; used by the parallel purge."""
+    with device_io_slot(directory):
+        for filename in filenames:
+            try:
+                os.unlink(os.path.join(directory, filename))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Read-only files on Windows need their attribute cleared first
+                path = os.path.join(directory, filename)
+                os.chmod(path, 0o666)
+                os.unlink(path)
+
+def purge_trash_batch(batch):
+    """Permanently removes a trash batch, unlinking directories in parallel."""
+    directories = []
+    workers = max(1, int(state.get_setting("purge_workers", 8)))
+    removed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for dirpath, dirnames, filenames in os.walk(batch.dir):
+            check_cancelled()
+            directories.append(dirpath)
+            # Symlinks to directories are listed as dirnames but are unlinked like files
+            links = [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]
+            if filenames or links:
+                futures.append(executor.submit(_unlink_files, dirpath, filenames + links))
+                removed += len(filenames) + len(links)
+            report_progress(removed, current=dirpath)
+        for future in futures:
+            future.result()
+    for directory in reversed(directories[1:]):
+        try:
+            os.rmdir(directory)
+        except FileNotFoundError:
+            pass
+    remove_trash_dir(batch.dir)
+    batch.purged = True
+    with state.lock:
+        if batch in state.trash_batches:
+            state.trash_batches.remove(batch)
+    print(f"Purged {removed} file(s) from trash.")
+
+def undo_delete():
+    """Restores the most recent trash batch that has not been purged yet."""
+    with state.lock:
+        batch = next((b for b in reversed(state.trash_batches) if not b.claimed), None)
+        if batch is not None:
+            batch.claimed = True  # The purge timer can no longer take it
+            batch.timer.cancel()
+            state.trash_batches.remove(batch)
+    if batch is None:
+        print("[INFO] Nothing to undo (deleted items have already been purged).")
+        return
+    restored = 0
+    for original, trashed in batch.items:
+        if os.path.lexists(original):
+            print(f"[WARN] '{original}' exists again; left in trash at {trashed}")
+            continue
+        try:
+            os.rename(trashed, original)
+            restored += 1
+        except OSError as e:
+            print(f"[ERROR] Could not restore {original}: {e}")
+    remove_trash_dir(batch.dir)
+    print(f"Restored {restored} item(s).")
+
+def purge_all_trash():
+    """Starts the background purge of every pending trash batch now."""
+    for batch in list(state.trash_batches):
+        schedule_purge(batch)
+
+# --- Bulk Rename ---
+
+BULKREN_JOURNAL = "bulkren_journal.json"
+BULKREN_TOKEN_RE = re.compile(r"\{(n|date|name|ext|parent)(?::([^}]*))?\}")
+
+def _expand_rename_tokens(template, path, counter):
+    """Expands {n}, {n:03}, {date}, {date:%Y%m%d}, {name}, {ext} and {parent} for one file."""
+    stem, ext = os.path.splitext(os.path.basename(path))
+
+    def expand(m):
+        token, spec = m.group(1), m.group(2)
+        if token == "n":
+            value = format(counter, spec or "d")
+        elif token == "date":
+            value = datetime.fromtimestamp(os.stat(path).st_mtime).strftime(spec or "%Y-%m-%d")
+        elif token == "name":
+            value = stem
+        elif token == "ext":
+            value = ext.lstrip(".")
+        else:
+            value = os.path.basename(os.path.dirname(path))
+        return value.replace("\\", "\\\\")  # Keep literal backslashes out of re.sub's template syntax
+
+    return BULKREN_TOKEN_RE.sub(expand, template)
+
+def plan_bulk_rename(paths, pattern, template, case=None, start=1):
+    """
+    Builds the complete rename plan in memory and checks it up front.
+    Returns (plan, problems) where plan is [(old path, new path)].
+    """
+    regex = re.compile(pattern)
+    plan, problems = [], []
+    for counter, path in enumerate(paths, start):
+        old_name = os.path.basename(path)
+        new_name = regex.sub(_expand_rename_tokens(template, path, counter), old_name, count=1)
+        if case == "lower":
+            new_name = new_name.lower()
+        elif case == "upper":
+            new_name = new_name.upper()
+        elif case == "title":
+            new_name = new_name.title()
+        if not new_name or new_name in (".", "..") or "/" in new_name or os.sep in new_name:
+            problems.append(f"{old_name}: invalid new name '{new_name}'")
+            continue
+        if new_name != old_name:
+            plan.append((path, os.path.join(os.path.dirname(path), new_name)))
+
+    sources = {os.path.normcase(old) for old, _ in plan}
+    targets = {}
+    for old, new in plan:
+        key = os.path.normcase(new)
+        if key in targets:
+            problems.append(f"{os.path.basename(old)} and {os.path.basename(targets[key])} would both become '{os.path.basename(new)}'")
+        targets[key] = old
+        # An existing target is fine only if it is itself being renamed away (swaps and cycles),
+        # or is the source itself, as with 'a.txt' -> 'A.txt' on a case-insensitive filesystem
+        case_only = old.lower() == new.lower() and _same_item(old, new)
+        if key not in sources and os.path.lexists(new) and os.path.normcase(old) != key and not case_only:
+            problems.append(f"'{os.path.basename(new)}' already exists")
+    return plan, problems
+
+def _same_item(path_a, path_b):
+    """True when both names refer to the same directory entry (without following symlinks)."""
+    try:
+        a, b = os.lstat(path_a), os.lstat(path_b)
+    except OSError:
+        return False
+    return (a.st_dev, a.st_ino) == (b.st_dev, b.st_ino)
+
+def _write_journal(journal):
+    path = get_config_path(BULKREN_JOURNAL)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(journal, f)
+    os.replace(path + ".tmp", path)
+
+def apply_bulk_rename(plan):
+    """
+    Applies a rename plan in two phases (every source to a temporary name,
+    then every temporary name to its target) so swaps and cycles cannot
+    collide. A journal is written first so a failed run can be rolled back.
+    """
+    token = f"{os.getpid()}-{int(time.time())}"
+    entries = [{"old": old, "temp": os.path.join(os.path.dirname(old), f".bulkren-{token}-{i}"), "new": new}
+               for i, (old, new) in enumerate(plan)]
+    journal = {"created": time.time(), "phase": "started", "entries": entries}
+    try:
+        _write_journal(journal)
+    except OSError as e:
+        print(f"[ERROR] Could not write the rename journal ({e}); nothing was renamed.")
+        return False
+    try:
+        for i, entry in enumerate(entries):
+            report_progress(i, len(entries) * 2, entry["old"])
+            os.rename(entry["old"], entry["temp"])
+        journal["phase"] = "temp"
+        _write_journal(journal)
+        for i, entry in enumerate(entries):
+            report_progress(len(entries) + i, len(entries) * 2, entry["new"])
+            os.rename(entry["temp"], entry["new"])
+        journal["phase"] = "done"
+        _write_journal(journal)
+    except (OSError, KeyboardInterrupt) as e:
+        print(f"\n[ERROR] Rename failed ({e}); rolling back...")
+        rollback_bulk_rename()
+        return False
+    print(f"Renamed {len(entries)} item(s). 'bulkren undo' reverts this run.")
+    return True
+
+def rollback_bulk_rename():
+    """Restores every item of the journalled run to its original name."""
+    path = get_config_path(BULKREN_JOURNAL)
+    try:
+        with open(path, encoding="utf-8") as f:
+            journal = json.load(f)
+    except (OSError, ValueError):
+        print("[INFO] No bulk rename journal to roll back.")
+        return
+    entries = journal["entries"]
+    # Undo phase 2 first (new -> temp), then phase 1 (temp -> old), so swaps and cycles unwind safely.
+    # Once phase 1 has completed, an entry without its temporary name has already reached its target.
+    restored = failed = 0
+    if journal["phase"] in ("temp", "done"):
+        for entry in entries:
+            if not os.path.lexists(entry["temp"]) and os.path.lexists(entry["new"]):
+                try:
+                    os.rename(entry["new"], entry["temp"])
+                except OSError as e:
+                    failed += 1
+                    print(f"[ERROR] Could not move back {entry['new']}: {e}")
+    for entry in entries:
+        if os.path.lexists(entry["temp"]):
+            try:
+                if os.path.lexists(entry["old"]) and not _same_item(entry["old"], entry["temp"]):
+                    # Still held by an item that could not be moved back: never overwrite it
+                    raise FileExistsError(errno.EEXIST, "name is still in use", entry["old"])
+                os.rename(entry["temp"], entry["old"])
+                restored += 1
+            except OSError as e:
+                failed += 1
+                print(f"[ERROR] Could not restore {entry['old']}: {e}")
+    if not failed:
+        os.remove(path)
+    print(f"Rolled back {restored} item(s){f', {failed} failed (journal kept)' if failed else ''}.")
+
+def bulk_rename_command(args):
+    """Handles 'bulkren <regex> <replacement> [case=lower|upper|title] [start=N] [--dry-run]' and 'bulkren undo'."""
+    if args and args[0].lower() in ("undo", "rollback"):
+        rollback_bulk_rename()
+        return
+    options = {a.split("=", 1)[0]: a.split("=", 1)[1] for a in args if a.startswith(("case=", "start="))}
+    dry_run = "--dry-run" in args
+    words = split_path_args([a for a in args if not a.startswith(("case=", "start=")) and a != "--dry-run"])
+    if len(words) != 2 or options.get("case", "lower") not in ("lower", "upper", "title"):
+        print("[ERROR] Usage: bulkren <regex> <replacement> [case=lower|upper|title] [start=N] [--dry-run]")
+        print("        Replacement tokens: \\1 {n} {n:03} {date} {date:%Y%m%d} {name} {ext} {parent}")
+        return
+    if state.selection:
+        paths = [os.path.join(state.current_directory, name) for name in state.selection]
+    else:
+        paths = list(state.last_find_results)
+    if not paths:
+        print("[ERROR] Select items or run 'find' first.")
+        return
+    if archive_is_read_only(state.current_directory):
+        return
+    try:
+        plan, problems = plan_bulk_rename(paths, words[0], words[1], options.get("case"), int(options.get("start", 1)))
+    except (re.error, ValueError, OSError) as e:
+        print(f"[ERROR] {e}")
+        return
+
+    for old, new in plan[:30]:
+        print(f"  {os.path.basename(old)} -> {os.path.basename(new)}")
+    if len(plan) > 30:
+        print(f"  ... and {len(plan) - 30} more")
+    if problems:
+        print(f"\n[ERROR] {len(problems)} conflict(s); nothing was renamed:")
+        for problem in problems[:30]:
+            print(f"  {problem}")
+        return
+    if not plan:
+        print("No names would change.")
+        return
+    if dry_run:
+        print(f"Dry run: {len(plan)} item(s) would be renamed.")
+        return
+    if not confirm_action(f"Rename {len(plan)} item(s)?"):
+        print("Rename cancelled.")
+        return
+    if apply_bulk_rename(plan):
+        state.selection.clear()
+        renamed = dict(plan)
+        state.last_find_results = PathList(renamed.get(p, p) for p in state.last_find_results)
+
+# --- Advanced Features ---
+
+SIZE_UNITS = {"": 1, "B": 1, "K": 1024, "KB": 1024, "M": 1024**2, "MB": 1024**2,
+              "G": 1024**3, "GB": 1024**3, "T": 1024**4, "TB": 1024**4}
+AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400, "y": 365 * 86400}
+FIND_FILTER_RE = re.compile(r"^(size|mtime)([<>]=?|=)(.+)$|^(type|kind|ext|depth|exclude):(.+)$", re.IGNORECASE)
+
+def parse_size(text):
+    """Parses sizes such as '1G', '500MB' or '1024' into bytes."""
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMGT]?B?)", text.strip(), re.IGNORECASE)
+    if not m:
+        raise ValueError(f"Invalid size: {text}")
+    return int(float(m.group(1)) * SIZE_UNITS[m.group(2).upper()])
+
+def parse_age(text):
+    """Parses ages such as '7d', '2y' or '90m' (minutes) into seconds."""
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([smhdwy])", text.strip())
+    if not m:
+        raise ValueError(f"Invalid age: {text} (use s, m, h, d, w or y)")
+    return float(m.group(1)) * AGE_UNITS[m.group(2)]
+
+class FindQuery:
+    """
+    A compiled find pattern plus filters. Name, extension and type are
+    checked first from DirEntry data, so a file is only stat'ed when it
+    has passed those and a size or date filter still needs checking.
+
+    Pattern: substring (case-insensitive), a glob when it contains * ? or [,
+    or a regex when prefixed with 're:'. Filters: size>1G size<=10M
+    mtime<7d (modified within) mtime>2y (older than) type:f|d ext:mov,mp4
+    kind:image,video (sniffed content type) depth:N exclude:node_modules,.git
+    """
+
+    def __init__(self, text):
+        self.size_checks = []   # (operator, bytes)
+        self.mtime_checks = []  # (operator, unix time), applied to modification time
+        self.kind = None        # 'f' or 'd'
+        self.content_kinds = None  # Sniffed kinds such as 'image', checked last
+        self.extensions = None
+        self.max_depth = None
+        self.excluded = []
+        words = []
+        now = time.time()
+        for token in text.split():
+            m = FIND_FILTER_RE.match(token)
+            if not m:
+                words.append(token)
+                continue
+            if m.group(1):
+                key, op, value = m.group(1).lower(), m.group(2), m.group(3)
+                if key == "size":
+                    self.size_checks.append((op, parse_size(value)))
+                else:
+                    # 'mtime<7d' means younger than 7 days, i.e. modified after now - 7d
+                    flipped = {"<": ">", "<=": ">=", ">": "<", ">=": "<=", "=": "="}[op]
+                    self.mtime_checks.append((flipped, now - parse_age(value)))
+            else:
+                key, value = m.group(4).lower(), m.group(5)
+                if key == "type":
+                    if value.lower() not in ("f", "d"):
+                        raise ValueError("type must be f or d")
+                    self.kind = value.lower()
+                elif key == "kind":
+                    self.content_kinds = set(k.lower() for k in value.split(","))
+                    unknown = self.content_kinds - CONTENT_KINDS
+                    if unknown:
+                        raise ValueError(f"Unknown kind: {', '.join(sorted(unknown))} (use {', '.join(sorted(CONTENT_KINDS))})")
+                    self.kind = "f"
+                elif key == "ext":
+                    self.extensions = tuple("." + e.lower().lstrip(".") for e in value.split(","))
+                elif key == "depth":
+                    self.max_depth = int(value)
+                else:
+                    self.excluded.extend(value.split(","))
+        self.pattern = " ".join(words)
+        # name_re is a bound search (re:, matches anywhere) or match (glob, whole name)
+        if self.pattern.startswith("re:"):
+            self.name_re = re.compile(self.pattern[3:], re.IGNORECASE).search
+        elif any(c in self.pattern for c in "*?["):
+            self.name_re = re.compile(fnmatch.translate(self.pattern), re.IGNORECASE).match
+        else:
+            self.name_re = None
+        self.needle = self.pattern.lower()
+
+    @property
+    def needs_stat(self):
+        return bool(self.size_checks or self.mtime_checks or self.content_kinds)
+
+    def name_matches(self, name):
+        if self.name_re is not None:
+            if not self.name_re(name):
+                return False
+        elif self.needle not in name.lower():
+            return False
+        return self.extensions is None or name.lower().endswith(self.extensions)
+
+    def prunes(self, name, depth):
+        """True if a directory should not be descended into."""
+        if self.max_depth is not None and depth >= self.max_depth:
+            return True
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self.excluded)
+
+    def stat_matches(self, size, mtime):
+        for op, limit in self.size_checks:
+            if not _compare(size, op, limit):
+                return False
+        for op, limit in self.mtime_checks:
+            if not _compare(mtime, op, limit):
+                return False
+        return True
+
+def _compare(value, op, limit):
+    if op == "<": return value < limit
+    if op == "<=": return value <= limit
+    if op == ">": return value > limit
+    if op == ">=": return value >= limit
+    return value == limit
+
+def iter_find_matches(query, base_dir):
+    """Yields the paths under base_dir that satisfy a FindQuery."""
+    index, inner = resolve_archive_path(base_dir)
+    if index is not None:
+        if query.content_kinds:
+            return  # Archive members cannot be sniffed without extracting them
+        root = os.path.normpath(base_dir)
+        prefix = f"{inner}/" if inner else ""
+        for member, entry in index.entries.items():
+            if member == inner or not member.startswith(prefix):
+                continue
+            if (query.kind and query.kind != ("d" if entry.is_dir else "f")) or not query.name_matches(member.rsplit("/", 1)[-1]):
+                continue
+            if not query.needs_stat or query.stat_matches(entry.size, entry.mtime):
+                yield os.path.join(root, *member[len(prefix):].split("/"))
+        return
+
+    stack = [(base_dir, 0)]
+    scanned = 0
+    while stack:
+        directory, depth = stack.pop()
+        scanned += 1
+        report_progress(scanned, current=directory)
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir and not query.prunes(entry.name, depth + 1):
+                stack.append((entry.path, depth + 1))
+            if query.kind and query.kind != ("d" if is_dir else "f"):
+                continue
+            if not query.name_matches(entry.name):
+                continue
+            if query.needs_stat:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if not query.stat_matches(st.st_size, st.st_mtime):
+                    continue
+                if query.content_kinds and sniff_type(entry.path, st)[0] not in query.content_kinds:
+                    continue
+            yield entry.path
+
+def find_files(pattern, base_dir=None):
+    """Finds files/directories matching a pattern and filters recursively."""
+    base_dir = base_dir or state.current_directory
+    try:
+        query = FindQuery(pattern)
+    except (ValueError, re.error) as e:
+        print(f"[ERROR] {e}")
+        return
+    print(f"Searching for '{pattern}' in {base_dir}...")
+    results = PathList()
+    try:
+        for path in iter_find_matches(query, base_dir):
+            results.append(path)
+    except Exception as e:
+        print(f"[ERROR] Search failed: {e}")
+        return
+
+    if not results:
+        print("No results found.")
+    else:
+        state.last_find_results = results
+        state.last_find_base = base_dir
+        print(f"Found {len(results)} result(s):")
+        show_find_results(1)
+
+def show_find_results(page=1):
+    """Prints one page of the last find results."""
+    results = state.last_find_results
+    page_size = max(1, int(state.get_setting("results_page_size", 50)))
+    pages = max(1, (len(results) + page_size - 1) // page_size)
+    page = min(max(1, page), pages)
+    start = (page - 1) * page_size
+    for i in range(start, min(start + page_size, len(results))):
+        path = results[i]
+        # Make path relative for cleaner display
+        try:
+            display_path = os.path.relpath(path, state.last_find_base)
+        except ValueError:
+            display_path = path
+        print(f"  {i+1}. {display_path}")
+    if pages > 1:
+        print(f"Page {page}/{pages} of {len(results)} result(s). Use 'results <page>' for more.")
+
+def find_results_command(args):
+    """Handles 'results [page]' and 'results copy|cut|del|checksum [range|all]'."""
+    results = state.last_find_results
+    if not results:
+        print("[INFO] No find results. Run 'find' or 'grep' first.")
+        return
+    if not args or args[0].isdigit():
+        show_find_results(int(args[0]) if args else 1)
+        return
+    action, rest = args[0].lower(), args[1:]
+    if action not in ("copy", "cut", "del", "checksum"):
+        print("[ERROR] Usage: results [page] | results copy|cut|del|checksum [range|all]")
+        return
+    algorithm = "sha256"
+    if action == "checksum" and rest and rest[0].lower() in HASH_ALGORITHMS:
+        algorithm, rest = rest[0].lower(), rest[1:]
+    indices = parse_index_ranges(rest, len(results))
+    if indices is None:
+        return
+    chosen = results.take(indices) if len(indices) != len(results) else results
+    if not chosen:
+        print("[ERROR] No results in that range.")
+        return
+    if action in ("copy", "cut"):
+        state.clipboard = chosen
+        state.clipboard_mode = action
+        print(f"{len(chosen)} result(s) ready to be {'moved' if action == 'cut' else 'pasted'}.")
+    elif action == "del":
+        if confirm_action(f"Delete {len(chosen)} result(s)?"):
+            if state.get_setting("use_trash", True):
+                trash_items(chosen)
+            else:
+                delete_items(chosen)
+            state.last_find_results = PathList()
+    else:
+        create_checksum_manifest(state.current_directory, chosen, algorithm)
+
+def get_item_info(item_arg):
+    """Displays detailed information about a file or directory."""
+    if not item_arg.isdigit() and name_is_listed(item_arg):
+        item_name = item_arg
+    else:
+        dirs, files = get_directory_contents(state.current_directory)
+        items = dirs + files
+
+        try:
+            index = int(item_arg) - 1
+            if 0 <= index < len(items):
+                item_name = items[index]
+            else:
+                print("[ERROR] Invalid index.")
+                return
+        except ValueError:
+            if item_arg in items:
+                item_name = item_arg
+            else:
+                print(f"[ERROR] Item '{item_arg}' not found.")
+                return
+
+    item_path = os.path.join(state.current_directory, item_name)
+    print(f"\n--- Info for: {item_name} ---")
+
+    entry = get_archive_entry(item_path)
+    if entry is not None:
+        show_archive_entry_info(item_path, entry)
+        print("--------------------------")
+        return
+
+    try:
+        stat = os.stat(item_path)
+        print(f"  Full Path: {item_path}")
+        print(f"  Type: {'Directory' if os.path.isdir(item_path) else 'File'}")
+        kind = None
+        if os.path.isfile(item_path):
+            kind, content_format = sniff_type(item_path, stat)
+            print(f"  Content: {content_format} ({kind})")
+        print(f"  Size: {format_size(stat.st_size)}")
+        if os.path.isdir(item_path):
+             usage, cached = disk_usage(item_path)
+             note = f" (cached, scanned {datetime.fromtimestamp(usage.scanned).strftime('%H:%M:%S')}; 'du refresh' rescans)" if cached else ""
+             print(f"  Size (recursive): {format_size(usage.apparent)} in {usage.files:,} file(s){note}")
+             print(f"  Size on Disk (recursive): {format_size(usage.allocated)}")
+        
+        print(f"  Created: {datetime.fromtimestamp(stat.st_ctime).strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"  Modified: {datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"  Accessed: {datetime.fromtimestamp(stat.st_atime).strftime('%Y-%m-%d %H:%M:%S')}")
+        
+        # Media info, only for files that sniff as audio/video so pydub and ffprobe stay unloaded otherwise
+        if kind in ("audio", "video") and state.get_setting("enable_media_info") and state.ffmpeg_configured:
+            get_media_info(item_path)
+
+        # Image info
+        Image = get_pil_image() if kind == "image" else None
+        if Image:
+            try:
+                with Image.open(item_path) as img:
+                    print(f"  Image Info: {img.format}, {img.size[0]}x{img.size[1]}, {img.mode}")
+            except Exception:
+                pass # Not an image or unsupported format
+
+    except FileNotFoundError:
+        print("  [ERROR] File not found.")
+    except Exception as e:
+        print(f"  [ERROR] Could not get info: {e}")
+    print("--------------------------")
+
+def get_media_info(file_path):
+    """Uses ffprobe (via pydub) to get media file information."""
+    AudioSegment = get_audio_segment()
+    if not AudioSegment: return
+
+    try:
+        info = AudioSegment.from_file(file_path).info
+        duration_s = float(info.get('duration', 0))
+        bit_rate_kbps = int(info.get('bit_rate', 0)) / 1000
+        codec = info.get('codec_name', 'N/A')
+        sample_rate = info.get('sample_rate', 'N/A')
+        
+        print(f"  Media Info: Codec: {codec}, Duration: {duration_s:.2f}s, Bitrate: {bit_rate_kbps:.0f} kbps")
+    except Exception:
+        # Fails silently if it's not a media file
+        pass
+
+def open_file(item_arg):
+    """Opens a file or directory with the default system application."""
+    if not item_arg.isdigit() and name_is_listed(item_arg):
+        item_name = item_arg
+    else:
+        dirs, files = get_directory_contents(state.current_directory)
+        items = dirs + files
+
+        try:
+            index = int(item_arg) - 1
+            if not (0 <= index < len(items)):
+                raise ValueError()
+            item_name = items[index]
+        except ValueError:
+            item_name = item_arg
+            if item_name not in items:
+                print(f"[ERROR] Item '{item_name}' not found.")
+                return
+
+    item_path = os.path.join(state.current_directory, item_name)
+    print(f"Opening '{item_name}'...")
+    try:
+        os.startfile(item_path)
+    except Exception as e:
+        print(f"[ERROR] Could not open file: {e}")
+
+def open_terminal():
+    """Opens a new terminal in the current directory."""
+    try:
+        if sys.platform == "win32":
+            os.system(f"start cmd.exe /K cd /d \"{state.current_directory}\"")
+        elif sys.platform == "darwin":
+            subprocess.run(["open", "-a", "Terminal", state.current_directory])
+        else: # Linux
+            # Try a few common terminals
+            terminals = ["gnome-terminal", "konsole", "xfce4-terminal", "xterm"]
+            for term in terminals:
+                if shutil.which(term):
+                    subprocess.run([term, "--working-directory", state.current_directory])
+                    return
+            print("[ERROR] Could not detect a known terminal emulator.")
+    except Exception as e:
+        print(f"[ERROR] Failed to open new terminal: {e}")
+
+HASH_BLOCK_SIZE = 1024 * 1024
+HASH_ALGORITHMS = ("sha256", "blake2b", "md5", "crc32")
+DIGEST_LENGTHS = {64: "sha256", 128: "blake2b", 32: "md5", 8: "crc32"}  # Hex digits -> algorithm
+
+class Crc32:
+    """hashlib-style wrapper around zlib.crc32."""
+    name = "crc32"
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return f"{self.value:08x}"
+
+def new_hasher(algorithm):
+    """Returns a fresh hash object for one of HASH_ALGORITHMS."""
+    if algorithm == "crc32":
+        return Crc32()
+    return hashlib.new(algorithm)
+
+_hash_buffers = threading.local()
+
+def hash_file(filepath, algorithm="sha256"):
+    """
+    Calculates the hex digest of a file (SHA-256 by default). Raises OSError
+    if it cannot be read; callers on worker pools hand the error back to the
+    job thread so it is reported with that job's output.
+    """
+    hasher = new_hasher(algorithm)
+    # One read buffer per thread, reused for every file that thread hashes
+    buffer = getattr(_hash_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _hash_buffers.buffer = bytearray(HASH_BLOCK_SIZE)
+    view = memoryview(buffer)
+    with device_io_slot(filepath), open(filepath, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            hasher.update(view[:read])
+        return hasher.hexdigest()
+
+def bounded_map(executor, func, items, window):
+    """
+    Like executor.map, but keeps at most 'window' tasks in flight so that
+    millions of inputs stream through without queuing them all. Yields
+    (item, result) in input order.
+    """
+    pending = deque()
+    for item in items:
+        pending.append((item, executor.submit(func, item)))
+        if len(pending) >= window:
+            item, future = pending.popleft()
+            yield item, future.result()
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result()
+
+class SpillingGroups:
+    """
+    (key, path) records grouped by key. They live in a dict until their
+    estimated size passes limit_bytes, then move to an SQLite table in a
+    temporary directory, where grouping is done by an index and SQLite's own
+    external sort, so memory stays flat however many files there are.
+    """
+
+    RECORD_OVERHEAD = 120  # Rough bytes per in-memory record besides the path itself
+    BATCH = 20000
+
+    def __init__(self, limit_bytes):
+        self.limit_bytes = limit_bytes
+        self.groups_in_memory = {}
+        self.memory_used = 0
+        self.db = None
+        self.db_dir = None
+        self.batch = []
+        self.count = 0
+
+    def add(self, key, path):
+        self.count += 1
+        if self.db is not None:
+            self.batch.append((key, path))
+            if len(self.batch) >= self.BATCH:
+                self._flush()
+            return
+        self.groups_in_memory.setdefault(key, []).append(path)
+        self.memory_used += self.RECORD_OVERHEAD + len(path)
+        if self.memory_used > self.limit_bytes:
+            self._spill()
+
+    def _spill(self):
+        self.db_dir = tempfile.mkdtemp(prefix="selectplus-dupes-")
+        # Duplicate sets outlive the job thread that found them ('bg dupes', then 'dedupe')
+        self.db = sqlite3.connect(os.path.join(self.db_dir, "groups.db"), check_same_thread=False)
+        cache_kib = max(2048, self.limit_bytes // 2048)  # Half the budget, in KiB
+        for pragma in ("journal_mode=OFF", "synchronous=OFF", "temp_store=FILE", f"cache_size=-{cache_kib}"):
+            self.db.execute(f"PRAGMA {pragma}")
+        self.db.execute("CREATE TABLE records (key, path TEXT)")
+        for key, paths in self.groups_in_memory.items():
+            self.batch.extend((key, path) for path in paths)
+            if len(self.batch) >= self.BATCH:
+                self._flush()
+        self._flush()
+        self.groups_in_memory = {}
+        self.memory_used = 0
+
+    def _flush(self):
+        if self.batch:
+            self.db.executemany("INSERT INTO records VALUES (?, ?)", self.batch)
+            self.batch = []
+
+    @property
+    def spilled(self):
+        return self.db is not None
+
+    def iter_groups(self):
+        """Yields (key, [paths]) for every key held by two or more records."""
+        if self.db is None:
+            for key, paths in self.groups_in_memory.items():
+                if len(paths) > 1:
+                    yield key, paths
+            return
+        self._flush()
+        self.db.execute("CREATE INDEX IF NOT EXISTS records_key ON records (key)")
+        rows = self.db.execute("SELECT key, path FROM records WHERE key IN "
+                               "(SELECT key FROM records GROUP BY key HAVING COUNT(*) > 1) ORDER BY key")
+        for key, group in itertools.groupby(rows, key=lambda row: row[0]):
+            yield key, [path for _, path in group]
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            shutil.rmtree(self.db_dir, ignore_errors=True)
+            self.db = None
+
+class DuplicateSets:
+    """
+    The duplicate sets found by the last 'dupes' scan. They are kept in an
+    SQLite table rather than in memory and read back one set at a time by the
+    report and by 'dedupe'.
+    """
+
+    def __init__(self):
+        self.groups = SpillingGroups(0)  # A zero budget puts every record on disk straight away
+        self.set_count = 0
+        self.file_count = 0
+        self.wasted = 0
+
+    def add_set(self, key, size, paths):
+        for path in paths:
+            self.groups.add(key, path)
+        self.set_count += 1
+        self.file_count += len(paths)
+        self.wasted += size * (len(paths) - 1)
+
+    def __len__(self):
+        return self.set_count
+
+    def __iter__(self):
+        """Yields (size, [paths]) per set."""
+        for key, paths in self.groups.iter_groups():
+            yield int(key.split(":", 1)[0]), paths
+
+    def close(self):
+        self.groups.close()
+
+def replace_duplicates(sets):
+    """Makes sets the current duplicate sets, discarding the previous ones."""
+    with state.lock:
+        previous, state.last_duplicates = state.last_duplicates, sets
+    if previous is not None:
+        previous.close()
+
+atexit.register(lambda: replace_duplicates(None))
+
+def find_duplicates(base_dir=None):
+    """
+    Finds duplicate files under base_dir: files are grouped by size first and
+    only sizes shared by two or more files are hashed, in parallel. Records
+    spill to disk past 'dupes_memory_mb' so huge trees do not exhaust RAM.
+    """
+    base_dir = base_dir or state.current_directory
+    limit = float(state.get_setting("dupes_memory_mb", 256)) * 1024 * 1024
+    workers = max(1, int(state.get_setting("hash_workers", os.cpu_count() or 2)))
+    by_size = SpillingGroups(limit / 2)
+    by_hash = SpillingGroups(limit / 2)
+
+    print("Scanning for duplicate files... (This may take a while)")
+    try:
+        file_count = 0
+        stack = [base_dir]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                size = entry.stat(follow_symlinks=False).st_size
+                                if size:
+                                    by_size.add(size, entry.path)
+                                    file_count += 1
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+            report_progress(file_count, current=directory)
+
+        candidates = total_bytes = 0
+        for size, paths in by_size.iter_groups():
+            candidates += len(paths)
+            total_bytes += size * len(paths)
+        print(f"{file_count} file(s); {candidates} share a size with another file and will be hashed"
+              + (" (size index spilled to disk)." if by_size.spilled else "."))
+
+        def sized_paths():
+            for size, paths in by_size.iter_groups():
+                for path in paths:
+                    yield size, path
+
+        def digest_of(item):
+            try:
+                return hash_file(item[1])
+            except OSError as e:
+                return e  # Printed on the job thread, not from the pool
+
+        hashed = bytes_hashed = 0
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for (size, path), digest in bounded_map(executor, digest_of, sized_paths(), workers * 4):
+                hashed += 1
+                bytes_hashed += size
+                if isinstance(digest, OSError):
+                    print(f"Error reading {path}: {digest}")
+                else:
+                    by_hash.add(f"{size}:{digest}", path)
+                report_progress(hashed, candidates, path, bytes_hashed, total_bytes)
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        executor.shutdown()
+        by_size.close()
+
+        sets = DuplicateSets()
+        try:
+            for key, paths in by_hash.iter_groups():
+                sets.add_set(key, int(key.split(":", 1)[0]), paths)
+        except BaseException:
+            sets.close()
+            raise
+        hash_spilled = by_hash.spilled
+    finally:
+        by_size.close()
+        by_hash.close()
+    replace_duplicates(sets if sets.set_count else None)
+
+    print(f"Scan complete: {file_count} file(s), {format_size(bytes_hashed)} hashed"
+          + (" (hash index spilled to disk)." if hash_spilled else "."))
+    if not sets.set_count:
+        print("No duplicate files found.")
+        return
+    shown = int(state.get_setting("dupes_display_sets", 200))
+    print(f"Found {sets.set_count} set(s) of duplicates, {format_size(sets.wasted)} reclaimable:")
+    for i, (size, files) in enumerate(itertools.islice(sets, shown)):
+        print(f"\n--- Set {i+1} (Size: {format_size(size)}) ---")
+        for f in files:
+            print(f"  - {os.path.relpath(f, base_dir)}")
+    if sets.set_count > shown:
+        print(f"\n... {sets.set_count - shown} more set(s) not shown.")
+    print("\nUse 'dedupe --dry-run' to see how much space linking them would reclaim.")
+
+# --- Deduplication ---
+
+FICLONE = 0x40049409  # Linux ioctl: share all extents of one file with another (btrfs, XFS)
+
+def reflink_file(source, target):
+    """Creates target as a copy-on-write clone of source. Raises OSError if unsupported."""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflinks are not supported on this platform")
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+def replace_with_link(keeper, duplicate, allow_reflink=True):
+    """
+    Atomically replaces duplicate with a reflink (preferred) or hardlink to
+    keeper, via a temporary name in the same directory. Returns the method used.
+    """
+    temp_path = os.path.join(os.path.dirname(duplicate), f".{os.path.basename(duplicate)}.selectplus-dedupe")
+    method = "hardlink"
+    try:
+        if allow_reflink:
+            try:
+                reflink_file(keeper, temp_path)
+                shutil.copystat(duplicate, temp_path)  # A clone is its own inode; keep the duplicate's metadata
+                method = "reflink"
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        if method == "hardlink":
+            os.link(keeper, temp_path)
+        os.replace(temp_path, duplicate)
+    except BaseException:
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        raise
+    return method
+
+def dedupe_duplicates(dry_run=False, hardlink_only=False):
+    """Replaces the duplicates from the last 'dupes' scan with links to the first file of each set."""
+    # Claim the sets so a second 'dedupe' or a new 'dupes' scan cannot close them mid-way
+    with state.lock:
+        sets, state.last_duplicates = state.last_duplicates, None
+    if not sets:
+        print("[ERROR] No duplicate sets. Run 'dupes' first.")
+        return
+    try:
+        _dedupe_sets(sets, dry_run, hardlink_only)
+    finally:
+        with state.lock:
+            keep = dry_run and state.last_duplicates is None  # A dry run leaves them for the real one
+            if keep:
+                state.last_duplicates = sets
+        if not keep:
+            sets.close()
+
+def _dedupe_sets(sets, dry_run, hardlink_only):
+    counts = {"reflink": 0, "hardlink": 0}
+    reclaimed = skipped = 0
+    total = sets.file_count - sets.set_count
+    done = 0
+    for _, files in sets:
+        keeper = files[0]
+        try:
+            keeper_stat = os.stat(keeper)
+        except OSError as e:
+            print(f"[WARN] Keeper unavailable, skipping set: {keeper}: {e}")
+            skipped += len(files) - 1
+            continue
+        for duplicate in files[1:]:
+            done += 1
+            report_progress(done, total, duplicate)
+            try:
+                dup_stat = os.stat(duplicate)
+                if (dup_stat.st_dev, dup_stat.st_ino) == (keeper_stat.st_dev, keeper_stat.st_ino):
+                    continue  # Already linked
+                if dup_stat.st_dev != keeper_stat.st_dev:
+                    print(f"[WARN] Different device, skipping: {duplicate}")
+                    skipped += 1
+                    continue
+                with device_io_slot(duplicate):
+                    if not files_identical(keeper, duplicate):
+                        print(f"[WARN] Content changed since scan, skipping: {duplicate}")
+                        skipped += 1
+                        continue
+                    if dry_run:
+                        print(f"  would link: {duplicate} -> {keeper}")
+                    else:
+                        counts[replace_with_link(keeper, duplicate, not hardlink_only)] += 1
+                reclaimed += allocated_size(dup_stat)
+            except OSError as e:
+                print(f"[ERROR] Could not dedupe {duplicate}: {e}")
+                skipped += 1
+
+    if dry_run:
+        print(f"Dry run: {format_size(reclaimed)} could be reclaimed; {skipped} file(s) would be skipped.")
+    else:
+        print(f"Replaced {counts['reflink']} file(s) with reflinks and {counts['hardlink']} with hardlinks; "
+              f"{format_size(reclaimed)} reclaimed, {skipped} skipped.")
+
+# --- Checksums ---
+
+MANIFEST_NAMES = {f"checksums.{a}" for a in HASH_ALGORITHMS} | {f"checksums.{a}.partial" for a in HASH_ALGORITHMS}
+
+def iter_checksum_targets(roots):
+    """Yields every file in or under the given paths, skipping checksum manifests."""
+    for root in roots:
+        if os.path.isfile(root):
+            yield root
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                if filename not in MANIFEST_NAMES and not os.path.islink(path):
+                    yield path
+
+def create_checksum_manifest(base_dir, roots, algorithm="sha256", manifest_path=None):
+    """
+    Hashes files on a worker pool and writes a sha256sum-compatible manifest
+    ('<digest>  <relative path>') into base_dir. Names containing a
+    backslash or line break are escaped the way sha256sum does it.
+    """
+    manifest_path = manifest_path or os.path.join(base_dir, f"checksums.{algorithm}")
+    workers = max(1, int(state.get_setting("hash_workers", os.cpu_count() or 2)))
+    temp_path = manifest_path + ".partial"
+    started = time.time()
+    count = total_bytes = errors = 0
+
+    def digest_of(path):
+        try:
+            return hash_file(path, algorithm)
+        except OSError as e:
+            return e  # Printed on the job thread, not from the pool
+
+    print(f"Hashing with {algorithm} on {workers} worker(s)...")
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor, open(temp_path, "w", encoding="utf-8", newline="\n") as out:
+            targets = iter_checksum_targets(roots)
+            for path, digest in bounded_map(executor, digest_of, targets, workers * 4):
+                try:
+                    rel = os.path.relpath(path, base_dir).replace(os.sep, "/")
+                except ValueError:  # Another drive on Windows: no relative path exists
+                    print(f"[WARN] Skipping {path}: not on the same drive as {base_dir}")
+                    rel = None
+                if isinstance(digest, OSError):
+                    print(f"Error reading {path}: {digest}")
+                if isinstance(digest, OSError) or rel is None:
+                    errors += 1
+                    continue
+                out.write(_format_manifest_line(digest, rel))
+                count += 1
+                try:
+                    total_bytes += os.path.getsize(path)
+                except OSError:
+                    pass
+                report_progress(count, current=rel, nbytes=total_bytes)
+        os.replace(temp_path, manifest_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)  # Interrupted or failed: do not leave a partial manifest behind
+    elapsed = max(time.time() - started, 0.001)
+    print(f"Wrote {count} checksum(s) to {manifest_path} in {format_duration(elapsed)} "
+          f"({format_size(total_bytes / elapsed)}/s), {errors} unreadable file(s).")
+
+MANIFEST_ESCAPES = {"\\": "\\\\", "\n": "\\n", "\r": "\\r"}
+MANIFEST_UNESCAPE_RE = re.compile(r"\\(.)")
+
+def _format_manifest_line(digest, rel):
+    """Formats one manifest line, with sha256sum's leading backslash when the name needs escaping."""
+    if any(c in rel for c in MANIFEST_ESCAPES):
+        escaped = "".join(MANIFEST_ESCAPES.get(c, c) for c in rel)
+        return f"\\{digest}  {escaped}\n"
+    return f"{digest}  {rel}\n"
+
+def _parse_manifest_line(line):
+    """Parses '<digest>  <path>' or '<digest> *<path>'; returns None for blank or malformed lines."""
+    line = line.rstrip("\r\n")
+    escaped = line.startswith("\\")
+    if escaped:
+        line = line[1:]
+    digest, sep, rel = line.partition(" ")
+    if not digest or not sep or not rel or not all(c in "0123456789abcdefABCDEF" for c in digest):
+        return None
+    rel = rel[1:] if rel[:1] in (" ", "*") else rel
+    if escaped:
+        unescapes = {"n": "\n", "r": "\r", "\\": "\\"}
+        rel = MANIFEST_UNESCAPE_RE.sub(lambda m: unescapes.get(m.group(1), m.group(0)), rel)
+    return digest.lower(), rel
+
+def verify_checksum_manifest(manifest_path):
+    """Re-hashes every file listed in a manifest in parallel and reports mismatches."""
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            entries = [e for e in map(_parse_manifest_line, f) if e]
+    except OSError as e:
+        print(f"[ERROR] Could not read manifest: {e}")
+        return
+    if not entries:
+        print("[ERROR] No checksum lines found in manifest.")
+        return
+    algorithm = DIGEST_LENGTHS.get(len(entries[0][0]))
+    if algorithm is None:
+        print(f"[ERROR] Unrecognised digest length: {len(entries[0][0])}")
+        return
+
+    def check(entry):
+        digest, rel = entry
+        path = os.path.join(base_dir, *rel.split("/"))
+        if not os.path.isfile(path):
+            return "MISSING"
+        try:
+            return "OK" if hash_file(path, algorithm) == digest else "FAILED"
+        except OSError:
+            return "FAILED"
+
+    workers = max(1, int(state.get_setting("hash_workers", os.cpu_count() or 2)))
+    results = {"OK": 0, "FAILED": 0, "MISSING": 0}
+    problems = []
+    started = time.time()
+    print(f"Verifying {len(entries)} file(s) with {algorithm}...")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for done, ((_, rel), result) in enumerate(bounded_map(executor, check, entries, workers * 4), 1):
+            results[result] += 1
+            if result != "OK":
+                problems.append(f"{rel}: {result}")
+            report_progress(done, len(entries), rel)
+    for line in problems[:100]:
+        print(f"  {line}")
+    if len(problems) > 100:
+        print(f"  ... and {len(problems) - 100} more")
+    print(f"Verified in {format_duration(time.time() - started)}: {results['OK']} OK, "
+          f"{results['FAILED']} FAILED, {results['MISSING']} MISSING.")
+
+def checksum_command(args, background=False):
+    """Handles 'checksum [algo]' and 'checksum verify <manifest>'."""
+    if args and args[0].lower() == "verify":
+        if len(args) < 2:
+            print("[ERROR] Usage: checksum verify <manifest>")
+            return
+        manifest = os.path.join(state.current_directory, " ".join(args[1:]))
+        if background:
+            job = submit_job(f"checksum verify {manifest}", verify_checksum_manifest, manifest)
+            print(f"Started job {job.id}: {job.name}")
+        else:
+            verify_checksum_manifest(manifest)
+        return
+    algorithm = args[0].lower() if args else "sha256"
+    if algorithm not in HASH_ALGORITHMS:
+        print(f"[ERROR] Unknown algorithm '{algorithm}'. Use one of: {', '.join(HASH_ALGORITHMS)}")
+        return
+    roots = [os.path.join(state.current_directory, name) for name in state.selection] or [state.current_directory]
+    if background:
+        job = submit_job(f"checksum {algorithm} {state.current_directory}", create_checksum_manifest,
+                         state.current_directory, roots, algorithm)
+        print(f"Started job {job.id}: {job.name}")
+    else:
+        create_checksum_manifest(state.current_directory, roots, algorithm)
+
+# --- Content Search ---
+
+GREP_SNIFF_BYTES = 8192       # A NUL byte in this first block marks the file as binary
+GREP_BATCH_FILES = 64         # Files handed to a worker process at a time
+GREP_MAX_LINE_LENGTH = 200    # Longer matching lines are truncated in the output
+
+def _required_literal(pattern):
+    """
+    Returns a substring every match of a simple regex must contain, so files
+    without it can be rejected with a plain find() before the regex runs.
+    Returns '' when the pattern is too complex to reason about: alternation,
+    groups, classes, escapes and {m,n} quantifiers all mean no prefilter.
+    """
+    if any(c in pattern for c in "|()[]{}\\"):
+        return ""
+    best = ""
+    for m in re.finditer(r"[^.^$*+?]+", pattern):
+        chunk = m.group()
+        if pattern[m.end():m.end() + 1] in ("*", "?"):
+            chunk = chunk[:-1]  # The last character may repeat zero times
+        if len(chunk) > len(best):
+            best = chunk
+    return best
+
+def _count_newlines(data, start, end):
+    """Counts newlines in data[start:end] in bounded slices (works on mmap)."""
+    count = 0
+    while start < end:
+        stop = min(end, start + 16 * 1024 * 1024)
+        count += data[start:stop].count(b"\n")
+        start = stop
+    return count
+
+def _grep_file(path, literal, regex, ignore_case):
+    """Returns [(line_number, line)] for one file, or None if it is binary or unreadable."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(GREP_SNIFF_BYTES)
+            if b"\0" in head:
+                return None
+            if len(head) < GREP_SNIFF_BYTES:
+                data = head  # The whole file is already in memory
+            else:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                if literal and not ignore_case and data.find(literal) < 0:
+                    return []  # Fast path: literal absent, skip the regex entirely
+                matches = []
+                line_no, counted_to = 1, 0
+                pos, size = 0, len(data)
+                while pos <= size:
+                    m = regex.search(data, pos)
+                    if m is None:
+                        break
+                    line_start = data.rfind(b"\n", 0, m.start()) + 1
+                    line_end = data.find(b"\n", m.start())
+                    if line_end < 0:
+                        line_end = size
+                    line_no += _count_newlines(data, counted_to, line_start)
+                    counted_to = line_start
+                    line = data[line_start:min(line_end, line_start + GREP_MAX_LINE_LENGTH)]
+                    matches.append((line_no, line.decode("utf-8", "replace").rstrip("\r")))
+                    pos = line_end + 1
+                return matches
+            finally:
+                if isinstance(data, mmap.mmap):
+                    data.close()
+    except (OSError, ValueError):
+        return None
+
+def _grep_batch(paths, pattern, is_literal, ignore_case):
+    """Worker-process entry point: searches a batch of files."""
+    raw = pattern.encode("utf-8", "surrogateescape")
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)  # ^ and $ anchor to lines, as in grep
+    regex = re.compile(re.escape(raw) if is_literal else raw, flags)
+    literal = raw if is_literal else _required_literal(pattern).encode("utf-8", "surrogateescape")
+    results = []
+    for path in paths:
+        matches = _grep_file(path, literal, regex, ignore_case)
+        if matches:
+            results.append((path, matches))
+    return results
+
+def grep_files(pattern, base_dir=None, ignore_case=False, fixed=False):
+    """
+    Searches file contents under base_dir on a process pool, streaming
+    'path:line:match' lines as batches finish. Matching files are stored
+    in state.last_find_results.
+    """
+    base_dir = base_dir or state.current_directory
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        if not fixed:
+            print(f"[ERROR] Invalid pattern: {e}")
+            return
+    is_literal = fixed or re.escape(pattern) == pattern
+    workers = max(1, int(state.get_setting("grep_workers", os.cpu_count() or 2)))
+    print(f"Searching contents for '{pattern}' in {base_dir}...")
+
+    state.last_find_results = PathList()
+    state.last_find_base = base_dir
+    files_scanned = matched_lines = 0
+    pending = set()
+
+    def drain(block):
+        nonlocal matched_lines
+        done = wait(pending, return_when=FIRST_COMPLETED)[0] if block else [f for f in pending if f.done()]
+        for future in done:
+            pending.discard(future)
+            for path, matches in future.result():
+                state.last_find_results.append(path)
+                try:
+                    display_path = os.path.relpath(path, base_dir)
+                except ValueError:
+                    display_path = path
+                for line_no, line in matches:
+                    print(f"{display_path}:{line_no}:{line}")
+                matched_lines += len(matches)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            batch = []
+            for root, _, files in os.walk(base_dir):
+                for name in files:
+                    batch.append(os.path.join(root, name))
+                    if len(batch) >= GREP_BATCH_FILES:
+                        pending.add(executor.submit(_grep_batch, batch, pattern, is_literal, ignore_case))
+                        files_scanned += len(batch)
+                        batch = []
+                        report_progress(files_scanned, current=root)
+                        # Bound the work in flight so memory stays flat on huge trees
+                        while len(pending) >= workers * 4:
+                            drain(block=True)
+                        drain(block=False)
+            if batch:
+                pending.add(executor.submit(_grep_batch, batch, pattern, is_literal, ignore_case))
+                files_scanned += len(batch)
+            while pending:
+                drain(block=True)
+        except (KeyboardInterrupt, JobCancelled):
+            for future in pending:
+                future.cancel()
+            print("\nSearch interrupted.")
+            raise
+
+    print(f"\n{matched_lines} matching line(s) in {len(state.last_find_results)} of {files_scanned} file(s).")
+
+# --- Disk Usage ---
+
+class DiskUsage:
+    """Recursive apparent/allocated totals for one scanned directory."""
+    __slots__ = ("path", "apparent", "allocated", "files", "dirs", "own_apparent",
+                 "own_allocated", "own_files", "largest_files", "subdirs", "hardlinks", "errors", "scanned",
+                 "mtime_ns")
+
+    def __init__(self, path):
+        self.path = path
+        self.apparent = 0       # Sum of st_size
+        self.allocated = 0      # Sum of st_blocks * 512
+        self.files = 0
+        self.dirs = 0
+        self.own_apparent = 0   # Files directly inside this directory
+        self.own_allocated = 0
+        self.own_files = 0
+        self.largest_files = [] # (allocated, apparent, name) of the biggest direct files
+        self.subdirs = []       # Paths of the direct subdirectories
+        self.hardlinks = 0      # Extra links to an already counted inode
+        self.errors = 0
+        self.scanned = time.time()
+        self.mtime_ns = None    # Directory mtime when scanned; a change invalidates the entry
+
+_du_cache = OrderedDict()  # Normalised directory path -> DiskUsage (LRU), for every directory of every scan
+
+def _du_cached(path):
+    """Returns the cached DiskUsage for path while the directory's mtime is unchanged, else None."""
+    with state.lock:
+        usage = _du_cache.get(path)
+    if usage is None:
+        return None
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime_ns = None
+    with state.lock:
+        if mtime_ns is None or mtime_ns != usage.mtime_ns:
+            _du_cache.pop(path, None)
+            return None
+        if path in _du_cache:
+            _du_cache.move_to_end(path)
+    return usage
+
+def _du_store(usages):
+    """Caches scan results, evicting the least recently used past 'du_cache_entries'."""
+    limit = int(state.get_setting("du_cache_entries", 100000))
+    with state.lock:
+        for usage in usages:
+            _du_cache.pop(usage.path, None)
+            _du_cache[usage.path] = usage
+        while len(_du_cache) > limit:
+            _du_cache.popitem(last=False)
+
+def allocated_size(st):
+    """Bytes actually allocated on disk; falls back to st_size where st_blocks is missing (Windows)."""
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+def _du_scan_directory(path, seen_inodes, inode_lock):
+    """Scans one directory level, returning its DiskUsage (direct files only) and its subdirectories."""
+    usage = DiskUsage(path)
+    subdirs = []
+    own = []
+    try:
+        usage.mtime_ns = os.stat(path).st_mtime_ns  # Before listing, so a change during the scan invalidates it
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                        continue
+                    if entry.is_symlink():
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    usage.errors += 1
+                    continue
+                # st_nlink is only filled in by DirEntry on POSIX; on Windows every file counts once
+                if st.st_nlink > 1:
+                    key = (st.st_dev, st.st_ino)
+                    with inode_lock:
+                        if key in seen_inodes:
+                            usage.hardlinks += 1
+                            continue
+                        seen_inodes.add(key)
+                allocated = allocated_size(st)
+                usage.own_apparent += st.st_size
+                usage.own_allocated += allocated
+                usage.own_files += 1
+                own.append((allocated, st.st_size, entry.name))
+    except OSError:
+        usage.errors += 1
+    usage.largest_files = heapq.nlargest(10, own)
+    usage.subdirs = subdirs
+    usage.apparent, usage.allocated, usage.files = usage.own_apparent, usage.own_allocated, usage.own_files
+    return usage, subdirs
+
+def scan_disk_usage(root):
+    """
+    Scans a tree breadth-first on a thread pool, level by level, then rolls
+    the per-directory totals up to their parents. Every directory's result is
+    cached so drilling down later needs no rescan.
+    """
+    root = os.path.normpath(os.path.abspath(root))
+    records = {}
+    seen_inodes = set()
+    inode_lock = threading.Lock()
+    frontier = [root]
+    workers = max(1, int(state.get_setting("du_workers", 8)))
+    files_seen = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while frontier:
+            next_frontier = []
+            for usage, subdirs in executor.map(lambda p: _du_scan_directory(p, seen_inodes, inode_lock), frontier):
+                records[usage.path] = usage
+                next_frontier.extend(subdirs)
+                files_seen += usage.own_files
+                report_progress(files_seen, current=usage.path)
+            frontier = next_frontier
+
+    # Roll totals up from the deepest directories first
+    deepest_first = sorted(records, key=lambda p: p.count(os.sep), reverse=True)
+    for path in deepest_first:
+        if path == root:
+            continue
+        usage = records[path]
+        parent = records.get(os.path.dirname(path))
+        if parent is not None:
+            parent.apparent += usage.apparent
+            parent.allocated += usage.allocated
+            parent.files += usage.files
+            parent.dirs += usage.dirs + 1
+            parent.hardlinks += usage.hardlinks
+            parent.errors += usage.errors
+
+    _du_store(records[p] for p in deepest_first)  # Root last, so it is the last to be evicted
+    return records[root]
+
+def disk_usage(path, refresh=False):
+    """Returns (DiskUsage, cached) for path, scanning it first if there is no valid cached result."""
+    path = os.path.normpath(os.path.abspath(path))
+    usage = None if refresh else _du_cached(path)
+    if usage is not None:
+        return usage, True
+    return scan_disk_usage(path), False
+
+def show_disk_usage(path, refresh=False):
+    """Prints per-child totals of a directory, largest allocation first."""
+    if not os.path.isdir(path):
+        print(f"[ERROR] Directory not found: {path}")
+        return
+    path = os.path.normpath(os.path.abspath(path))
+    usage = None if refresh else _du_cached(path)
+    cached = usage is not None
+    if not cached:
+        print(f"Scanning {path}...")
+        usage = scan_disk_usage(path)
+
+    rows = []
+    for child_path in usage.subdirs:
+        child = _du_cache.get(child_path)
+        if child is not None:
+            rows.append((child.allocated, child.apparent, f"{child.files:,}", os.path.basename(child_path) + os.sep))
+    for allocated, apparent, name in usage.largest_files:
+        rows.append((allocated, apparent, "", name))
+    rows.sort(reverse=True)
+
+    scanned = datetime.fromtimestamp(usage.scanned).strftime('%H:%M:%S')
+    print(f"\n--- Disk usage: {path} ({'cached, ' if cached else ''}scanned {scanned}) ---")
+    print(f"  {'Allocated':>11} {'Apparent':>11} {'%':>5} {'Files':>10}  Name")
+    total = usage.allocated or 1
+    for allocated, apparent, files, name in rows:
+        print(f"  {format_size(allocated):>11} {format_size(apparent):>11} {allocated * 100 / total:>5.1f} {files:>10}  {name}")
+    other_files = usage.own_files - len(usage.largest_files)
+    if other_files > 0:
+        listed = sum(row[0] for row in usage.largest_files)
+        print(f"  {format_size(usage.own_allocated - listed):>11} {'':>11} {'':>5} {other_files:>10,}  (other files)")
+    print(f"  {'-' * 50}")
+    print(f"  {format_size(usage.allocated):>11} {format_size(usage.apparent):>11} {'':>5} {usage.files:>10,}  Total ({usage.dirs:,} dirs)")
+    if usage.hardlinks:
+        print(f"  {usage.hardlinks:,} extra hardlink(s) counted once.")
+    if usage.errors:
+        print(f"  [WARN] {usage.errors:,} item(s) could not be read.")
+    print("Use 'du <dir>' to drill down (served from cache) or 'du refresh' to rescan.")
+
+# --- Tree Sync ---
+
+MTIME_TOLERANCE = 2.0  # Seconds; FAT and some network shares store 2-second timestamps
+
+def scan_tree(root, job=None):
+    """
+    Returns ({relative path: (is_dir, size, mtime)}, [warnings]) for everything
+    under root. Symbolic links are neither followed nor listed; they are
+    reported in the warnings, which the caller prints on the job's thread.
+    """
+    entries = {}
+    links = []
+    warnings = []
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        check_cancelled(job)
+        try:
+            with os.scandir(os.path.join(root, rel_dir) if rel_dir else root) as it:
+                for entry in it:
+                    rel = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            entries[rel] = (True, 0, 0)
+                            stack.append(rel)
+                        elif entry.is_symlink():
+                            links.append(rel)
+                        elif entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            entries[rel] = (False, st.st_size, st.st_mtime)
+                    except OSError:
+                        continue
+        except OSError as e:
+            warnings.append(f"[WARN] Cannot read {os.path.join(root, rel_dir)}: {e}")
+    if links:
+        shown = ", ".join(sorted(links)[:5]) + (", ..." if len(links) > 5 else "")
+        warnings.append(f"[WARN] Skipped {len(links)} symbolic link(s) in {root}: {shown}")
+    return entries, warnings
+
+def scan_trees_parallel(*roots):
+    """Scans several trees at the same time, one worker per tree, and returns their entries."""
+    job = current_job()
+    with ThreadPoolExecutor(max_workers=len(roots)) as executor:
+        results = list(executor.map(lambda root: scan_tree(root, job), roots))
+    for _, warnings in results:
+        for warning in warnings:
+            print(warning)
+    return [entries for entries, _ in results]
+
+def split_path_args(args):
+    """Splits command arguments, honouring "double quoted" paths that contain spaces."""
+    return [a.strip('"') for a in shlex.split(" ".join(args), posix=False)]
+
+def plan_sync(src, dst, delete=False, use_hash=False):
+    """Compares two trees and returns (new, changed, extra) relative path lists."""
+    if os.path.isdir(dst):
+        src_tree, dst_tree = scan_trees_parallel(src, dst)
+    else:
+        (src_tree,), dst_tree = scan_trees_parallel(src), {}
+    check_cancelled()  # Killed during the scan: stop before planning or copying anything
+    new, changed, extra, to_hash = [], [], [], []
+    for rel, (is_dir, size, mtime) in src_tree.items():
+        other = dst_tree.get(rel)
+        if other is None:
+            new.append(rel)
+        elif is_dir != other[0]:
+            changed.append(rel)
+        elif not is_dir:
+            if size != other[1]:
+                changed.append(rel)
+            elif use_hash:
+                to_hash.append(rel)
+            elif abs(mtime - other[2]) > MTIME_TOLERANCE:
+                changed.append(rel)
+    if to_hash:
+        def same_content(rel):
+            try:
+                return hash_file(os.path.join(src, rel)) == hash_file(os.path.join(dst, rel))
+            except OSError as e:
+                return e  # Printed on the job thread, not from the pool
+        workers = max(1, int(state.get_setting("sync_workers", 4)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for rel, same in zip(to_hash, executor.map(same_content, to_hash)):
+                if isinstance(same, OSError):
+                    print(f"[WARN] Could not hash '{rel}' ({same}); treating it as changed.")
+                    changed.append(rel)
+                elif not same:
+                    changed.append(rel)
+    if delete:
+        extra = [rel for rel in dst_tree if rel not in src_tree]
+    return new, changed, extra, src_tree
+
+def _sync_copy_file(src_path, dst_path):
+    """Copies one file through a temporary name so a partial copy never replaces a good file."""
+    temp_path = dst_path + ".selectplus-partial"
+    try:
+        with device_io_slot(os.path.dirname(dst_path)):
+            copy_file_sparse(src_path, temp_path)
+            shutil.copystat(src_path, temp_path)
+        os.replace(temp_path, dst_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+def sync_trees(src, dst, delete=False, dry_run=False, use_hash=False):
+    """Mirrors src into dst, copying only new or changed files in parallel."""
+    src, dst = os.path.abspath(src), os.path.abspath(dst)
+    if not os.path.isdir(src):
+        print(f"[ERROR] Source directory not found: {src}")
+        return
+    started = time.time()
+    print(f"Comparing {src} -> {dst}{' (hashing)' if use_hash else ''}...")
+    new, changed, extra, src_tree = plan_sync(src, dst, delete, use_hash)
+    copy_files = [rel for rel in new + changed if not src_tree[rel][0]]
+    make_dirs = sorted(rel for rel in new + changed if src_tree[rel][0])
+    copy_bytes = sum(src_tree[rel][1] for rel in copy_files)
+
+    print(f"Plan: {len(new)} new, {len(changed)} changed, {len(extra)} to delete, "
+          f"{format_size(copy_bytes)} to copy.")
+    if dry_run:
+        for label, items in (("+", new), ("~", changed), ("-", extra)):
+            for rel in sorted(items)[:50]:
+                print(f"  {label} {rel}")
+            if len(items) > 50:
+                print(f"  {label} ... and {len(items) - 50} more")
+        print("Dry run: nothing was changed.")
+        return
+
+    os.makedirs(dst, exist_ok=True)
+    # Type changes (file <-> directory) need the old item out of the way first
+    for rel in changed:
+        target = os.path.join(dst, rel)
+        if os.path.isdir(target) and not src_tree[rel][0]:
+            shutil.rmtree(target)
+        elif os.path.isfile(target) and src_tree[rel][0]:
+            os.remove(target)
+    for rel in make_dirs:
+        os.makedirs(os.path.join(dst, rel), exist_ok=True)
+
+    def copy_one(rel):
+        try:
+            _sync_copy_file(os.path.join(src, rel), os.path.join(dst, rel))
+        except Exception as e:
+            return e
+        return None
+
+    errors = 0
+    workers = max(1, int(state.get_setting("sync_workers", 4)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        copied = 0
+        try:
+            for done, (rel, error) in enumerate(bounded_map(executor, copy_one, copy_files, workers * 4), 1):
+                if error is None:
+                    copied += src_tree[rel][1]
+                else:
+                    errors += 1
+                    print(f"[ERROR] Failed to copy '{rel}': {error}")
+                report_progress(done, len(copy_files), rel, copied, copy_bytes)
+        except BaseException:  # Ctrl+C or a killed job: drop the queued copies, finish the running ones
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    # Delete files before directories, deepest paths first
+    for rel in sorted(extra, key=lambda r: r.count(os.sep), reverse=True):
+        target = os.path.join(dst, rel)
+        try:
+            if os.path.isdir(target) and not os.path.islink(target):
+                shutil.rmtree(target)
+            elif os.path.lexists(target):
+                os.remove(target)
+        except OSError as e:
+            errors += 1
+            print(f"[ERROR] Could not delete '{rel}': {e}")
+
+    elapsed = time.time() - started
+    print(f"Sync complete in {format_duration(elapsed)}: {len(copy_files)} file(s), "
+          f"{format_size(copy_bytes)} copied, {len(extra)} deleted, {errors} error(s).")
+
+# --- Tree Comparison ---
+
+COMPARE_BLOCK_SIZE = 1024 * 1024
+
+def files_identical(path_a, path_b, block_size=COMPARE_BLOCK_SIZE):
+    """Compares two files block by block, stopping at the first difference."""
+    buffer_a, buffer_b = bytearray(block_size), bytearray(block_size)
+    view_a, view_b = memoryview(buffer_a), memoryview(buffer_b)
+    with open(path_a, "rb") as fa, open(path_b, "rb") as fb:
+        if os.fstat(fa.fileno()).st_size != os.fstat(fb.fileno()).st_size:
+            return False
+        while True:
+            read_a = fa.readinto(buffer_a)
+            read_b = fb.readinto(buffer_b)
+            if read_a != read_b or view_a[:read_a] != view_b[:read_b]:
+                return False
+            if read_a == 0:
+                return True
+
+def _missing_from(tree, other):
+    """Entries of tree absent from other; a missing directory is listed once, not per descendant."""
+    return sorted(rel for rel in tree
+                  if rel not in other and (not os.path.dirname(rel) or os.path.dirname(rel) in other))
+
+def diff_trees(dir_a, dir_b, quick=False):
+    """Reports files that exist on one side only or differ in type, size or content."""
+    dir_a, dir_b = os.path.abspath(dir_a), os.path.abspath(dir_b)
+    for path in (dir_a, dir_b):
+        if not os.path.isdir(path):
+            print(f"[ERROR] Directory not found: {path}")
+            return
+    started = time.time()
+    print(f"Comparing {dir_a} with {dir_b}...")
+    tree_a, tree_b = scan_trees_parallel(dir_a, dir_b)
+
+    only_a = _missing_from(tree_a, tree_b)
+    only_b = _missing_from(tree_b, tree_a)
+    type_diff, size_diff, same_size = [], [], []
+    for rel, (is_dir, size, _) in tree_a.items():
+        other = tree_b.get(rel)
+        if other is None:
+            continue
+        if is_dir != other[0]:
+            type_diff.append(rel)
+        elif not is_dir:
+            (size_diff if size != other[1] else same_size).append(rel)
+
+    content_diff, errors = [], []
+    if not quick and same_size:
+        def compare(rel):
+            try:
+                with device_io_slot(os.path.join(dir_a, rel)):
+                    return files_identical(os.path.join(dir_a, rel), os.path.join(dir_b, rel))
+            except OSError as e:
+                return e
+        workers = max(1, int(state.get_setting("sync_workers", 4)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                for done, (rel, result) in enumerate(bounded_map(executor, compare, same_size, workers * 4), 1):
+                    if isinstance(result, OSError):
+                        errors.append(f"{rel}: {result}")
+                    elif not result:
+                        content_diff.append(rel)
+                    report_progress(done, len(same_size), rel)
+            except BaseException:  # Ctrl+C or a killed job: drop the queued comparisons
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+
+    sections = [(f"Only in {dir_a}", only_a), (f"Only in {dir_b}", only_b),
+                ("File/directory mismatch", type_diff), ("Size differs", sorted(size_diff)),
+                ("Content differs", sorted(content_diff)), ("Could not compare", errors)]
+    for title, items in sections:
+        if not items:
+            continue
+        print(f"\n--- {title} ({len(items)}) ---")
+        for rel in items[:50]:
+            print(f"  {rel}")
+        if len(items) > 50:
+            print(f"  ... and {len(items) - 50} more")
+
+    differing = [os.path.join(dir_a, rel) for rel in only_a + type_diff + size_diff + content_diff]
+    differing += [os.path.join(dir_b, rel) for rel in only_b]
+    state.last_find_results = PathList(differing)
+    state.last_find_base = os.path.dirname(dir_a)
+    checked = "sizes only" if quick else f"{len(same_size)} same-size file(s) compared by content"
+    print(f"\nCompared {len(tree_a)} vs {len(tree_b)} item(s) in {format_duration(time.time() - started)} ({checked}).")
+    print("Trees are identical." if not differing and not errors else f"{len(differing)} difference(s) found.")
+
+# --- Archive Creation ---
+
+# Extensions whose contents are already compressed; zip stores them as-is
+COMPRESSED_EXTENSIONS = {".zip", ".gz", ".tgz", ".bz2", ".xz", ".txz", ".7z", ".rar", ".zst", ".jpg", ".jpeg",
+                         ".png", ".gif", ".webp", ".heic", ".mp3", ".aac", ".ogg", ".flac", ".m4a", ".mp4",
+                         ".mkv", ".mov", ".avi", ".webm", ".pdf", ".docx", ".xlsx", ".pptx", ".apk", ".jar"}
+ARCHIVE_FORMATS = {".zip": "zip", ".tar": "tar", ".tar.gz": "gz", ".tgz": "gz", ".tar.xz": "xz", ".txz": "xz"}
+ARCHIVE_BLOCK_SIZES = {"gz": 1 << 20, "xz": 8 << 20}  # Bytes of tar stream per independently compressed block
+
+def _gzip_block(block, level):
+    """Compresses one block into a complete gzip member; stores it when deflate does not help."""
+    member = gzip.compress(block, compresslevel=level, mtime=0)
+    if level and len(member) >= len(block):
+        member = gzip.compress(block, compresslevel=0, mtime=0)
+    return member
+
+def _xz_block(block, preset):
+    """Compresses one block into a complete .xz stream (LZMA2 stores incompressible chunks itself)."""
+    return lzma.compress(block, format=lzma.FORMAT_XZ, preset=preset)
+
+class ParallelCompressWriter:
+    """
+    A write-only file object for tarfile's stream mode. The tar stream is cut
+    into fixed-size blocks compressed on a process pool, pigz-style, and the
+    results are written in order. Concatenated gzip members and xz streams
+    are valid files that gzip, xz and tarfile read back as one, and at most
+    'window' blocks are in memory at a time.
+    """
+
+    def __init__(self, out, executor, compress, level, block_size, window):
+        self.out = out
+        self.executor = executor
+        self.compress = compress
+        self.level = level
+        self.block_size = block_size
+        self.window = window
+        self.buffer = bytearray()
+        self.pending = deque()
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def write(self, data):
+        self.buffer += data
+        self.bytes_in += len(data)
+        while len(self.buffer) >= self.block_size:
+            self._submit(bytes(self.buffer[:self.block_size]))
+            del self.buffer[:self.block_size]
+        return len(data)
+
+    def _submit(self, block):
+        self.pending.append(self.executor.submit(self.compress, block, self.level))
+        while len(self.pending) > self.window:
+            self._write_next()
+
+    def _write_next(self):
+        data = self.pending.popleft().result()
+        self.out.write(data)
+        self.bytes_out += len(data)
+
+    def close(self):
+        if self.buffer:
+            self._submit(bytes(self.buffer))
+            self.buffer = bytearray()
+        while self.pending:
+            self._write_next()
+
+def iter_archive_members(roots, base_dir, exclude):
+    """
+    Yields (path, arcname) for every directory, file and symbolic link under
+    roots, parents first. Links to directories are yielded as links and not
+    followed.
+    """
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            check_cancelled()
+            yield dirpath, os.path.relpath(dirpath, base_dir)
+            links = [name for name in dirnames if os.path.islink(os.path.join(dirpath, name))]
+            dirnames[:] = [name for name in dirnames if name not in links]
+            for name in sorted(filenames + links):
+                path = os.path.join(dirpath, name)
+                if os.path.abspath(path) != exclude:
+                    yield path, os.path.relpath(path, base_dir)
+        if os.path.isfile(root) and os.path.abspath(root) != exclude:
+            yield root, os.path.relpath(root, base_dir)
+
+def create_archive(archive_path, roots, base_dir, store=False, level=None):
+    """
+    Packs roots into archive_path (.zip, .tar, .tar.gz/.tgz or .tar.xz/.txz)
+    with names relative to base_dir, writing a .partial file until done.
+    """
+    lower = archive_path.lower()
+    kind = next(fmt for ext, fmt in ARCHIVE_FORMATS.items() if lower.endswith(ext))
+    exclude = os.path.abspath(archive_path)
+    workers = max(1, int(state.get_setting("archive_workers", os.cpu_count() or 2)))
+    partial = archive_path + ".partial"
+    started = time.time()
+    count = total = links = 0
+
+    def members():
+        """Streams the members, counting items, links and input bytes on the way."""
+        nonlocal count, total, links
+        for path, arcname in iter_archive_members(roots, base_dir, exclude):
+            check_cancelled()
+            try:
+                st = os.lstat(path)
+            except OSError:
+                st = None
+            if os.path.islink(path):
+                links += 1
+            elif st is not None and not os.path.isdir(path):
+                total += st.st_size
+            count += 1
+            yield path, arcname
+
+    print(f"Packing into {os.path.basename(archive_path)}"
+          + (f" on {workers} process(es)..." if kind in ("gz", "xz") else "..."))
+    try:
+        with open(partial, "wb") as raw:
+            if kind == "zip":
+                method = zipfile.ZIP_STORED if store else zipfile.ZIP_DEFLATED
+                with zipfile.ZipFile(raw, "w", method, compresslevel=level, allowZip64=True) as zf:
+                    for path, arcname in members():
+                        if os.path.islink(path):
+                            # Stored the way Info-ZIP does: link mode bits, the target as the data
+                            info = zipfile.ZipInfo(arcname, time.localtime(os.lstat(path).st_mtime)[:6])
+                            info.external_attr = 0o120777 << 16
+                            zf.writestr(info, os.readlink(path))
+                        else:
+                            stored = store or os.path.splitext(path)[1].lower() in COMPRESSED_EXTENSIONS
+                            zf.write(path, arcname, compress_type=zipfile.ZIP_STORED if stored else method)
+                        report_progress(count, current=arcname, nbytes=total)
+                written = raw.tell()
+            elif kind == "tar":
+                with tarfile.open(fileobj=raw, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+                    for path, arcname in members():
+                        tar.add(path, arcname, recursive=False)
+                        report_progress(count, current=arcname, nbytes=total)
+                written = raw.tell()
+            else:
+                compress = _gzip_block if kind == "gz" else _xz_block
+                level = (0 if store else 6) if level is None else level
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    writer = ParallelCompressWriter(raw, executor, compress, level,
+                                                    ARCHIVE_BLOCK_SIZES[kind], workers * 2)
+                    with tarfile.open(fileobj=writer, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+                        for path, arcname in members():
+                            tar.add(path, arcname, recursive=False)
+                            report_progress(count, current=arcname, nbytes=total)
+                    writer.close()
+                written = writer.bytes_out
+        os.replace(partial, archive_path)
+    except BaseException:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        raise
+    elapsed = max(time.time() - started, 0.001)
+    ratio = f", {written * 100 / total:.0f}% of original" if total else ""
+    print(f"Wrote {archive_path}: {count:,} item(s), {format_size(written)}{ratio} in {format_duration(elapsed)} "
+          f"({format_size(total / elapsed)}/s).")
+    if links:
+        print(f"  {links:,} symbolic link(s) stored as links, not followed.")
+
+def archive_command(args, background=False):
+    """Handles 'archive <name>.zip|.tar|.tar.gz|.tar.xz [store] [level=N]' for the selection."""
+    store = level = None
+    names = []
+    for arg in split_path_args(args):
+        if arg.lower() == "store":
+            store = True
+        elif arg.lower().startswith("level="):
+            level = arg[6:]
+        else:
+            names.append(arg)
+    if len(names) != 1 or not any(names[0].lower().endswith(ext) for ext in ARCHIVE_FORMATS):
+        print("[ERROR] Usage: archive <name>.zip|.tar|.tar.gz|.tar.xz [store] [level=N]")
+        return
+    if not state.selection:
+        print("[ERROR] Nothing selected. Select the items to pack first.")
+        return
+    if level is not None:
+        if not level.isdigit() or int(level) > 9:
+            print("[ERROR] level must be 0-9.")
+            return
+        level = int(level)
+    archive_path = os.path.join(state.current_directory, names[0])
+    if store and archive_path.lower().endswith((".tar.xz", ".txz")):
+        print("[ERROR] xz has no store mode; use .tar or .zip for already-compressed media.")
+        return
+    if os.path.exists(archive_path) and not confirm_action(f"'{names[0]}' exists. Overwrite?"):
+        return
+    roots = [os.path.join(state.current_directory, name) for name in sorted(state.selection)]
+    args = (archive_path, roots, state.current_directory, bool(store), level)
+    if background:
+        job = submit_job(f"archive {names[0]}", create_archive, *args)
+        print(f"Started job {job.id}: {job.name}")
+        return
+    try:
+        create_archive(*args)
+    except KeyboardInterrupt:
+        print("\nArchive cancelled.")
+    except OSError as e:
+        print(f"[ERROR] Could not write archive: {e}")
+
+# --- File Viewer ---
+
+VIEW_CHECKPOINT_LINES = 65536  # A line-start offset is remembered every this many lines
+VIEW_CHUNK = 1 << 20
+
+class FileViewer:
+    """
+    Line access to a file of any size through mmap. Nothing is read up front:
+    line offsets are found by counting newlines in 1 MiB chunks, and only
+    every VIEW_CHECKPOINT_LINES-th line start is remembered, so jumping
+    around a multi-GB log stays cheap in both time and memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        # mmap cannot map an empty file
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.checkpoints = array('Q', [0])  # checkpoints[k] = offset of line k * VIEW_CHECKPOINT_LINES + 1
+        self.scanned_to = 0                 # Offset up to which checkpoints are complete
+
+    def close(self):
+        if self.size:
+            self.data.close()
+        self.file.close()
+
+    def _count_newlines(self, start, end):
+        """Counts newlines in data[start:end], one chunk at a time (mmap has no count())."""
+        total = 0
+        for pos in range(start, end, VIEW_CHUNK):
+            total += self.data[pos:min(pos + VIEW_CHUNK, end)].count(b"\n")
+        return total
+
+    def _skip_lines(self, pos, count):
+        """Returns the offset just after the count-th newline from pos (or the end of file)."""
+        data = self.data
+        while count > 0 and pos < self.size:
+            chunk_end = min(pos + VIEW_CHUNK, self.size)
+            newlines = data[pos:chunk_end].count(b"\n")
+            if newlines < count:
+                count -= newlines
+                pos = chunk_end
+                continue
+            while count > 0:
+                pos = data.find(b"\n", pos, chunk_end) + 1
+                count -= 1
+        return pos
+
+    def _extend_checkpoints(self, line=None, offset=None):
+        """Records checkpoints until they cover the given line number or byte offset."""
+        while self.scanned_to < self.size:
+            covered_line = len(self.checkpoints) * VIEW_CHECKPOINT_LINES
+            if line is not None and line <= covered_line:
+                return
+            if offset is not None and offset < self.checkpoints[-1]:
+                return
+            check_cancelled()
+            nxt = self._skip_lines(self.checkpoints[-1], VIEW_CHECKPOINT_LINES)
+            self.scanned_to = nxt
+            if nxt >= self.size:
+                return
+            self.checkpoints.append(nxt)
+
+    def line_offset(self, line):
+        """Returns the byte offset where 1-based line starts (clamped to the last line)."""
+        line = max(1, line)
+        self._extend_checkpoints(line=line)
+        k = min((line - 1) // VIEW_CHECKPOINT_LINES, len(self.checkpoints) - 1)
+        pos = self._skip_lines(self.checkpoints[k], line - 1 - k * VIEW_CHECKPOINT_LINES)
+        return self.line_start(pos) if pos >= self.size else pos
+
+    def line_number(self, offset):
+        """Returns the 1-based line number containing offset."""
+        self._extend_checkpoints(offset=offset)
+        k = bisect.bisect_right(self.checkpoints, offset) - 1
+        return k * VIEW_CHECKPOINT_LINES + self._count_newlines(self.checkpoints[k], offset) + 1
+
+    def line_start(self, offset):
+        """Returns the start of the line containing offset."""
+        if offset >= self.size and self.size and self.data[self.size - 1:self.size] == b"\n":
+            offset = self.size - 1  # Past the final newline: step back onto the last line
+        return self.data.rfind(b"\n", 0, min(offset, self.size)) + 1 if self.size else 0
+
+    def lines_from(self, offset, count):
+        """Returns (lines, next offset) for up to count lines starting at offset."""
+        lines = []
+        while len(lines) < count and offset < self.size:
+            end = self.data.find(b"\n", offset)
+            end = self.size if end == -1 else end
+            lines.append(self.data[offset:end])
+            offset = end + 1
+        return lines, offset
+
+    def tail_offset(self, count):
+        """Returns the offset of the start of the last count lines."""
+        pos = self.size
+        if pos and self.data[pos - 1:pos] == b"\n":
+            pos -= 1
+        for _ in range(count):
+            pos = self.data.rfind(b"\n", 0, pos)
+            if pos == -1:
+                return 0
+        return pos + 1
+
+    def back_lines(self, offset, count):
+        """Returns the start of the line count lines before the one at offset."""
+        pos = offset
+        for _ in range(count):
+            if pos <= 0:
+                return 0
+            pos = self.data.rfind(b"\n", 0, pos - 1) + 1
+        return pos
+
+    def search(self, needle, offset, backward=False):
+        """Finds needle (bytes) after offset or before it; returns the match offset or -1."""
+        if backward:
+            return self.data.rfind(needle, 0, max(0, offset))
+        return self.data.find(needle, offset)
+
+def format_view_line(raw, width, number=None):
+    """Decodes one line for display, expanding tabs and cutting it to the terminal width."""
+    text = raw.rstrip(b"\r").decode("utf-8", "replace").expandtabs(4)
+    if number is not None:
+        text = f"{number:>7} {text}"
+    return text if len(text) < width else text[:width - 2] + "…"
+
+def resolve_item_path(item_arg):
+    """Returns the path for a listing index, name in the current directory, or a path; None if missing."""
+    if not item_arg.isdigit() and name_is_listed(item_arg):
+        return os.path.join(state.current_directory, item_arg)
+    dirs, files = get_directory_contents(state.current_directory)
+    items = dirs + files
+    if item_arg.isdigit() and 0 < int(item_arg) <= len(items):
+        return os.path.join(state.current_directory, items[int(item_arg) - 1])
+    path = os.path.join(state.current_directory, os.path.expanduser(item_arg.strip('"')))
+    if os.path.exists(path):
+        return path
+    print(f"[ERROR] Item '{item_arg}' not found.")
+    return None
+
+def open_viewer(item_arg):
+    """Returns a FileViewer for a regular file argument, or None after printing why not."""
+    path = resolve_item_path(item_arg)
+    if path is None:
+        return None
+    if not os.path.isfile(path):
+        print(f"[ERROR] Not a regular file: {path}")
+        return None
+    try:
+        return FileViewer(path)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Could not open {path}: {e}")
+        return None
+
+def split_count_arg(args, default):
+    """Splits a trailing line count off 'head'/'tail' arguments."""
+    if len(args) > 1 and args[-1].lstrip("-").isdigit():
+        return " ".join(args[:-1]), abs(int(args[-1]))
+    return " ".join(args), default
+
+def head_file(args):
+    """Handles 'head <file> [N]'."""
+    item_arg, count = split_count_arg(args, 10)
+    viewer = open_viewer(item_arg)
+    if viewer is None:
+        return
+    try:
+        width = get_terminal_width()
+        for raw in viewer.lines_from(0, count)[0]:
+            print(format_view_line(raw, width))
+    finally:
+        viewer.close()
+
+def tail_file(args):
+    """Handles 'tail <file> [N]'."""
+    item_arg, count = split_count_arg(args, 10)
+    viewer = open_viewer(item_arg)
+    if viewer is None:
+        return
+    try:
+        width = get_terminal_width()
+        for raw in viewer.lines_from(viewer.tail_offset(count), count)[0]:
+            print(format_view_line(raw, width))
+    finally:
+        viewer.close()
+
+def follow_file(args):
+    """Handles 'follow <file>': prints the tail, then new data as it is appended, until Ctrl+C."""
+    item_arg, count = split_count_arg(args, 10)
+    viewer = open_viewer(item_arg)
+    if viewer is None:
+        return
+    path = viewer.path
+    try:
+        width = get_terminal_width()
+        for raw in viewer.lines_from(viewer.tail_offset(count), count)[0]:
+            print(format_view_line(raw, width))
+    finally:
+        viewer.close()
+    print(f"--- Following {path} (Ctrl+C to stop) ---")
+    interval = float(state.get_setting("follow_interval", 0.5))
+    position = viewer.size
+    pending = b""
+    try:
+        with open(path, "rb") as f:
+            while True:
+                check_cancelled()
+                try:
+                    size = os.stat(path).st_size
+                except OSError:
+                    size = position
+                if size < position:
+                    print("--- File truncated; following from the start ---")
+                    position, pending = 0, b""
+                if size > position:
+                    f.seek(position)
+                    data = f.read(min(size - position, VIEW_CHUNK))
+                    position += len(data)
+                    lines = (pending + data).split(b"\n")
+                    pending = lines.pop()  # Incomplete last line waits for its newline
+                    if len(pending) > VIEW_CHUNK:
+                        lines.append(pending)
+                        pending = b""
+                    for raw in lines:
+                        print(format_view_line(raw, width))
+                    if size > position:
+                        continue  # Still catching up
+                sys.stdout.flush()
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        if pending:
+            print(format_view_line(pending, width))
+        print("--- Stopped following ---")
+
+VIEW_HELP = ("Enter/space: next page  b: back  g <line>: go to line  @<offset>: go to byte  "
+             "G: end  /text: search  ?text: search back  n/N: repeat search  q: quit")
+
+def view_file(args):
+    """Handles 'view <file> [line|@offset]': an interactive pager over FileViewer."""
+    target = None
+    if len(args) > 1 and (args[-1].isdigit() or args[-1].startswith("@")):
+        target = args.pop()
+    viewer = open_viewer(" ".join(args))
+    if viewer is None:
+        return
+    numbers = state.get_setting("view_line_numbers", True)
+    top_offset, top_line = 0, 1
+    needle, backward = None, False
+
+    def goto_offset(offset):
+        start = viewer.line_start(min(max(0, offset), viewer.size))
+        return start, viewer.line_number(start)
+
+    try:
+        if target and target.startswith("@"):
+            top_offset, top_line = goto_offset(int(target[1:]) if target[1:].isdigit() else 0)
+        elif target:
+            top_line = max(1, int(target))
+            top_offset = viewer.line_offset(top_line)
+            top_line = viewer.line_number(top_offset)
+        while True:
+            width, height = get_terminal_width(), max(5, get_terminal_height() - 3)
+            clear_screen()
+            lines, next_offset = viewer.lines_from(top_offset, height)
+            for n, raw in enumerate(lines):
+                print(format_view_line(raw, width, top_line + n if numbers else None))
+            for _ in range(height - len(lines)):
+                print("~")
+            percent = next_offset * 100 // viewer.size if viewer.size else 100
+            status = f"{os.path.basename(viewer.path)} | line {top_line:,} | {format_size(viewer.size)} | {percent}%"
+            raw_key = prompt_input(f"-- {status} -- (h for help) ")
+            key = raw_key.strip()
+            if key in ("q", "quit", "exit"):
+                break
+            if key in ("", " ", "f"):
+                if next_offset < viewer.size:
+                    top_offset, top_line = next_offset, top_line + len(lines)
+            elif key == "b":
+                top_offset = viewer.back_lines(top_offset, height)
+                top_line = viewer.line_number(top_offset)
+            elif key == "G":
+                top_offset = viewer.tail_offset(height)
+                top_line = viewer.line_number(top_offset)
+            elif key.startswith("g"):
+                line = key[1:].strip()
+                top_offset = viewer.line_offset(int(line)) if line.isdigit() else 0
+                top_line = viewer.line_number(top_offset)
+            elif key.startswith("@") and key[1:].isdigit():
+                top_offset, top_line = goto_offset(int(key[1:]))
+            elif key[:1] in ("/", "?") or key in ("n", "N"):
+                if key[:1] in ("/", "?"):
+                    text = raw_key.lstrip()[1:]  # Trailing spaces are part of the search text
+                    if text:
+                        needle = text.encode("utf-8")
+                    backward = key[0] == "?"
+                if not needle:
+                    continue
+                reverse = backward != (key == "N")
+                start = top_offset if reverse else (viewer.data.find(b"\n", top_offset) + 1 or viewer.size)
+                found = viewer.search(needle, start, reverse)
+                if found == -1:
+                    prompt_input(f"Pattern not found: {needle.decode('utf-8', 'replace')} (Enter) ")
+                else:
+                    top_offset, top_line = goto_offset(found)
+            elif key == "h":
+                prompt_input(VIEW_HELP + " (Enter) ")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        viewer.close()
+
+# --- Scan Snapshots ---
+
+SCAN_MAGIC = b"SPSCAN1\n"
+
+class ScanSnapshot:
+    """
+    Every file of a tree held column-wise: paths in a PathList plus parallel
+    arrays of sizes, mtimes and extension ids. Queries run over whole columns
+    (with NumPy when it is installed) instead of walking the disk again.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.created = time.time()
+        self.paths = PathList()
+        self.sizes = array('q')
+        self.mtimes = array('d')
+        self.ext_ids = array('I')
+        self.exts = []      # Distinct lower-case extensions, '' for none
+        self._ext_ids = {}
+        self.errors = 0
 
-# --- Advanced Features ---
+    def __len__(self):
+        return len(self.sizes)
 
-def find_files(pattern):
-    """Finds files/directories matching a pattern recursively."""
-    print(f"Searching for '{pattern}' in {state.current_directory}...")
-    results = []
-    try:
-        for root, dirs, files in os.walk(state.current_directory):
-            for name in dirs + files:
-                if pattern.lower() in name.lower():
-                    full_path = os.path.join(root, name)
-                    results.append(full_path)
-    except Exception as e:
-        print(f"[ERROR] Search failed: {e}")
-        return
+    def add(self, path, size, mtime):
+        ext = os.path.splitext(path)[1].lower()
+        ext_id = self._ext_ids.get(ext)
+        if ext_id is None:
+            ext_id = self._ext_ids[ext] = len(self.exts)
+            self.exts.append(ext)
+        self.paths.append(path)
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+        self.ext_ids.append(ext_id)
 
-    if not results:
-        print("No results found.")
-    else:
-        state.last_find_results = results
-        print(f"Found {len(results)} result(s):")
-        for i, path in enumerate(results):
-            # Make path relative for cleaner display
+    def _columns(self):
+        paths = self.paths
+        return [paths._parents, paths._offsets, paths._names, self.sizes, self.mtimes, self.ext_ids]
+
+    def save(self, filepath):
+        """Writes the snapshot as a JSON header line followed by the raw column bytes."""
+        columns = self._columns()
+        header = {"root": self.root, "created": self.created, "errors": self.errors,
+                  "byteorder": sys.byteorder, "dirs": self.paths._dirs, "exts": self.exts,
+                  "lengths": [len(c) if isinstance(c, bytearray) else len(c) * c.itemsize for c in columns]}
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        partial = filepath + ".partial"
+        try:
+            with open(partial, "wb") as f:
+                f.write(SCAN_MAGIC)
+                f.write(json.dumps(header, ensure_ascii=False).encode("utf-8", "surrogateescape") + b"\n")
+                for column in columns:
+                    f.write(column)
+            os.replace(partial, filepath)
+        except BaseException:
             try:
-                display_path = os.path.relpath(path, state.current_directory)
-            except ValueError:
-                display_path = path
-            print(f"  {i+1}. {display_path}")
+                os.remove(partial)
+            except OSError:
+                pass
+            raise
 
-def get_item_info(item_arg):
-    """Displays detailed information about a file or directory."""
-    dirs, files = get_directory_contents(state.current_directory)
-    items = dirs + files
-    item_name = ""
+    @classmethod
+    def load(cls, filepath):
+        with open(filepath, "rb") as f:
+            if f.read(len(SCAN_MAGIC)) != SCAN_MAGIC:
+                raise ValueError(f"Not a scan snapshot: {filepath}")
+            header = json.loads(f.readline().decode("utf-8", "surrogateescape"))
+            snapshot = cls(header["root"])
+            snapshot.created, snapshot.errors = header["created"], header["errors"]
+            snapshot.exts = header["exts"]
+            snapshot._ext_ids = {ext: i for i, ext in enumerate(snapshot.exts)}
+            paths = snapshot.paths
+            paths._dirs = header["dirs"]
+            paths._dir_ids = {d: i for i, d in enumerate(paths._dirs)}
+            paths._offsets = array('Q')
+            for column, length in zip(snapshot._columns(), header["lengths"]):
+                data = f.read(length)
+                if len(data) != length:
+                    raise ValueError(f"Truncated scan snapshot: {filepath}")
+                if isinstance(column, bytearray):
+                    column += data
+                    continue
+                column.frombytes(data)
+                if header["byteorder"] != sys.byteorder:
+                    column.byteswap()
+        return snapshot
 
-    try:
-        index = int(item_arg) - 1
-        if 0 <= index < len(items):
-            item_name = items[index]
-        else:
-            print("[ERROR] Invalid index.")
-            return
-    except ValueError:
-        if item_arg in items:
-            item_name = item_arg
-        else:
-            print(f"[ERROR] Item '{item_arg}' not found.")
-            return
+_scan_snapshots = {}  # Root -> ScanSnapshot, loaded or built this session
 
-    item_path = os.path.join(state.current_directory, item_name)
-    print(f"\n--- Info for: {item_name} ---")
-    
+def get_scan_file(root):
+    """Returns where the snapshot of root is stored in the config directory."""
+    digest = hashlib.sha1(root.encode("utf-8", "surrogateescape")).hexdigest()[:16]
+    return get_config_path(os.path.join("scans", f"{digest}.scan"))
+
+def build_scan_snapshot(root):
+    """Walks root with scandir and saves a fresh snapshot of all its files (kept in memory if saving fails)."""
+    root = os.path.normpath(os.path.abspath(root))
+    snapshot = ScanSnapshot(root)
+    stack = [root]
+    while stack:
+        check_cancelled()
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            snapshot.add(entry.path, st.st_size, st.st_mtime)
+                    except OSError:
+                        snapshot.errors += 1
+        except OSError:
+            snapshot.errors += 1
+        report_progress(len(snapshot), current=directory)
+    with state.lock:
+        _scan_snapshots[root] = snapshot  # Kept for 'query' this session even if saving fails
     try:
-        stat = os.stat(item_path)
-        print(f"  Full Path: {item_path}")
-        print(f"  Type: {'Directory' if os.path.isdir(item_path) else 'File'}")
-        print(f"  Size: {format_size(stat.st_size)}")
-        if os.path.isdir(item_path):
-             size_on_disk = get_directory_size(item_path)
-             print(f"  Size on Disk (recursive): {format_size(size_on_disk)}")
-        
-        print(f"  Created: {datetime.fromtimestamp(stat.st_ctime).strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"  Modified: {datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"  Accessed: {datetime.fromtimestamp(stat.st_atime).strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        # Media info
-        if state.ffmpeg_configured and state.get_setting("enable_media_info"):
-            get_media_info(item_path)
+        snapshot.save(get_scan_file(root))
+    except OSError as e:
+        print(f"[WARN] Could not save the snapshot ({e}); it is kept in memory for this session only.")
+    return snapshot
 
-        # Image info
-        Image = get_pil_image()
-        if Image and not os.path.isdir(item_path):
+def find_scan_snapshot(path):
+    """Returns the snapshot covering path (its own or the nearest ancestor's), or None."""
+    path = os.path.normpath(os.path.abspath(path))
+    candidate = path
+    while True:
+        snapshot = _scan_snapshots.get(candidate)
+        if snapshot is None and os.path.exists(get_scan_file(candidate)):
             try:
-                with Image.open(item_path) as img:
-                    print(f"  Image Info: {img.format}, {img.size[0]}x{img.size[1]}, {img.mode}")
-            except Exception:
-                pass # Not an image or unsupported format
+                snapshot = ScanSnapshot.load(get_scan_file(candidate))
+            except (OSError, ValueError) as e:
+                print(f"[WARN] Ignoring unreadable snapshot of {candidate}: {e}")
+            else:
+                with state.lock:
+                    _scan_snapshots[candidate] = snapshot
+        if snapshot is not None:
+            return snapshot
+        parent = os.path.dirname(candidate)
+        if parent == candidate:
+            return None
+        candidate = parent
 
-    except FileNotFoundError:
-        print("  [ERROR] File not found.")
-    except Exception as e:
-        print(f"  [ERROR] Could not get info: {e}")
-    print("--------------------------")
+def scan_command(args):
+    """Handles 'scan [dir]': snapshots a tree for the 'query' command."""
+    base_dir = resolve_directory_arg(args) if args else state.current_directory
+    if base_dir is None:
+        return
+    print(f"Scanning {base_dir}...")
+    start = time.time()
+    snapshot = build_scan_snapshot(base_dir)
+    print(f"Snapshot of {len(snapshot):,} file(s), {format_size(sum(snapshot.sizes))}, "
+          f"taken in {format_duration(time.time() - start)}.")
+    if snapshot.errors:
+        print(f"  [WARN] {snapshot.errors:,} item(s) could not be read.")
+    print("Ask it with 'query top 100', 'query older 2y', 'query larger 1G', 'query ext' or 'query hist'.")
 
-def get_media_info(file_path):
-    """Uses ffprobe (via pydub) to get media file information."""
-    AudioSegment = get_audio_segment()
-    if not AudioSegment: return
+def _subtree_mask(snapshot, base):
+    """Per-directory-id flags for the directories at or below base, or None for the whole snapshot."""
+    if base == snapshot.root:
+        return None
+    prefix = base.rstrip(os.sep) + os.sep
+    return [d == base or d.startswith(prefix) for d in snapshot.paths._dirs]
 
-    try:
-        info = AudioSegment.from_file(file_path).info
-        duration_s = float(info.get('duration', 0))
-        bit_rate_kbps = int(info.get('bit_rate', 0)) / 1000
-        codec = info.get('codec_name', 'N/A')
-        sample_rate = info.get('sample_rate', 'N/A')
-        
-        print(f"  Media Info: Codec: {codec}, Duration: {duration_s:.2f}s, Bitrate: {bit_rate_kbps:.0f} kbps")
-    except Exception:
-        # Fails silently if it's not a media file
-        pass
+def select_snapshot_rows(snapshot, base, size_min=None, mtime_before=None):
+    """Returns the row indices under base passing the filters, vectorized when NumPy is available."""
+    dir_mask = _subtree_mask(snapshot, base)
+    np = get_numpy()
+    if np is not None:
+        keep = np.ones(len(snapshot), dtype=bool)
+        if dir_mask is not None:
+            keep &= np.asarray(dir_mask, dtype=bool)[np.frombuffer(snapshot.paths._parents, dtype=np.uint32)]
+        if size_min is not None:
+            keep &= np.frombuffer(snapshot.sizes, dtype=np.int64) >= size_min
+        if mtime_before is not None:
+            keep &= np.frombuffer(snapshot.mtimes, dtype=np.float64) < mtime_before
+        return np.flatnonzero(keep).tolist()
+    parents, sizes, mtimes = snapshot.paths._parents, snapshot.sizes, snapshot.mtimes
+    return [i for i in range(len(snapshot))
+            if (dir_mask is None or dir_mask[parents[i]])
+            and (size_min is None or sizes[i] >= size_min)
+            and (mtime_before is None or mtimes[i] < mtime_before)]
 
-def open_file(item_arg):
-    """Opens a file or directory with the default system application."""
-    dirs, files = get_directory_contents(state.current_directory)
-    items = dirs + files
+def top_snapshot_rows(snapshot, rows, count):
+    """Returns the count largest of rows, biggest first."""
+    np = get_numpy()
+    if np is not None and rows:
+        rows = np.asarray(rows)
+        sizes = np.frombuffer(snapshot.sizes, dtype=np.int64)[rows]
+        if count < len(rows):
+            picked = np.argpartition(sizes, len(rows) - count)[len(rows) - count:]
+            rows, sizes = rows[picked], sizes[picked]
+        return rows[np.argsort(-sizes, kind="stable")].tolist()
+    return heapq.nlargest(count, rows, key=snapshot.sizes.__getitem__)
+
+def size_by_extension(snapshot, rows):
+    """Returns [(total bytes, file count, extension)] for rows, largest first."""
+    np = get_numpy()
+    if np is not None and rows:
+        idx = np.asarray(rows)
+        ext_ids = np.frombuffer(snapshot.ext_ids, dtype=np.uint32)[idx]
+        totals = np.bincount(ext_ids, weights=np.frombuffer(snapshot.sizes, dtype=np.int64)[idx], minlength=len(snapshot.exts))
+        counts = np.bincount(ext_ids, minlength=len(snapshot.exts))
+        stats = [(int(totals[i]), int(counts[i]), ext) for i, ext in enumerate(snapshot.exts) if counts[i]]
+    else:
+        totals, counts = [0] * len(snapshot.exts), [0] * len(snapshot.exts)
+        ext_ids, sizes = snapshot.ext_ids, snapshot.sizes
+        for i in rows:
+            totals[ext_ids[i]] += sizes[i]
+            counts[ext_ids[i]] += 1
+        stats = [(totals[i], counts[i], ext) for i, ext in enumerate(snapshot.exts) if counts[i]]
+    return sorted(stats, reverse=True)
+
+def size_histogram(snapshot, rows):
+    """Returns {power of two: (file count, total bytes)}; bucket b holds sizes in [2**(b-1), 2**b)."""
+    np = get_numpy()
+    if np is not None and rows:
+        sizes = np.frombuffer(snapshot.sizes, dtype=np.int64)[np.asarray(rows)]
+        buckets = np.zeros(len(sizes), dtype=np.int64)
+        nonzero = sizes > 0
+        buckets[nonzero] = np.floor(np.log2(sizes[nonzero])).astype(np.int64) + 1
+        counts = np.bincount(buckets)
+        totals = np.bincount(buckets, weights=sizes)
+        return {b: (int(counts[b]), int(totals[b])) for b in range(len(counts)) if counts[b]}
+    histogram = {}
+    sizes = snapshot.sizes
+    for i in rows:
+        bucket = sizes[i].bit_length()
+        count, total = histogram.get(bucket, (0, 0))
+        histogram[bucket] = (count + 1, total + sizes[i])
+    return histogram
 
+def query_command(args):
+    """Handles 'query top [N] | larger <size> | older <age> | ext | hist' against the snapshot."""
+    usage = "[ERROR] Usage: query top [N] | larger <size> | older <age> | ext | hist"
+    if not args:
+        print(usage)
+        return
+    base = os.path.normpath(os.path.abspath(state.current_directory))
+    snapshot = find_scan_snapshot(base)
+    if snapshot is None:
+        print("[INFO] No snapshot covers this directory. Run 'scan' first.")
+        return
+    action, rest = args[0].lower(), args[1:]
+    start = time.time()
     try:
-        index = int(item_arg) - 1
-        if not (0 <= index < len(items)):
-            raise ValueError()
-        item_name = items[index]
-    except ValueError:
-        item_name = item_arg
-        if item_name not in items:
-            print(f"[ERROR] Item '{item_name}' not found.")
+        if action == "top":
+            count = int(rest[0]) if rest else 20
+            if count < 1:
+                raise ValueError("'query top' needs a count of at least 1.")
+            rows = top_snapshot_rows(snapshot, select_snapshot_rows(snapshot, base), count)
+        elif action == "larger" and rest:
+            rows = select_snapshot_rows(snapshot, base, size_min=parse_size(rest[0]))
+        elif action == "older" and rest:
+            rows = select_snapshot_rows(snapshot, base, mtime_before=time.time() - parse_age(rest[0]))
+        elif action in ("ext", "hist"):
+            rows = select_snapshot_rows(snapshot, base)
+        else:
+            print(usage)
             return
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return
+    elapsed = f"{(time.time() - start) * 1000:.1f} ms"
+    taken = datetime.fromtimestamp(snapshot.created).strftime('%Y-%m-%d %H:%M')
+    print(f"\n--- Query '{' '.join(args)}' on snapshot of {snapshot.root} (taken {taken}), {elapsed} ---")
 
-    item_path = os.path.join(state.current_directory, item_name)
-    print(f"Opening '{item_name}'...")
-    try:
-        os.startfile(item_path)
-    except Exception as e:
-        print(f"[ERROR] Could not open file: {e}")
+    if action == "ext":
+        print(f"  {'Size':>11} {'Files':>10}  Extension")
+        for total, count, ext in size_by_extension(snapshot, rows)[:50]:
+            print(f"  {format_size(total):>11} {count:>10,}  {ext or '(none)'}")
+        return
+    if action == "hist":
+        histogram = size_histogram(snapshot, rows)
+        peak = max((count for count, _ in histogram.values()), default=1)
+        print(f"  {'Size range':>21} {'Files':>10} {'Total':>11}")
+        for bucket in sorted(histogram):
+            count, total = histogram[bucket]
+            low = 0 if bucket == 0 else 1 << (bucket - 1)
+            label = "0 B" if bucket == 0 else f"{format_size(low)} - {format_size((1 << bucket) - 1)}"
+            print(f"  {label:>21} {count:>10,} {format_size(total):>11}  {'#' * max(1, count * 30 // peak)}")
+        return
 
-def open_terminal():
-    """Opens a new terminal in the current directory."""
-    try:
-        if sys.platform == "win32":
-            os.system(f"start cmd.exe /K cd /d \"{state.current_directory}\"")
-        elif sys.platform == "darwin":
-            subprocess.run(["open", "-a", "Terminal", state.current_directory])
-        else: # Linux
-            # Try a few common terminals
-            terminals = ["gnome-terminal", "konsole", "xfce4-terminal", "xterm"]
-            for term in terminals:
-                if shutil.which(term):
-                    subprocess.run([term, "--working-directory", state.current_directory])
-                    return
-            print("[ERROR] Could not detect a known terminal emulator.")
-    except Exception as e:
-        print(f"[ERROR] Failed to open new terminal: {e}")
+    state.last_find_results = snapshot.paths.take(rows)
+    state.last_find_base = base
+    print(f"{len(rows):,} file(s), {format_size(sum(snapshot.sizes[i] for i in rows))}.")
+    if action == "top":
+        for n, i in enumerate(rows, 1):
+            mtime = datetime.fromtimestamp(snapshot.mtimes[i]).strftime('%Y-%m-%d')
+            print(f"  {n}. {format_size(snapshot.sizes[i]):>11}  {mtime}  {os.path.relpath(snapshot.paths[i], base)}")
+    else:
+        show_find_results(1)
+    print("Use 'results' to page, copy or delete these files. Snapshots do not update; re-run 'scan' to refresh.")
 
-def hash_file(filepath):
-    """Calculates SHA-256 hash of a file."""
-    sha256_hash = hashlib.sha256()
-    try:
-        with open(filepath, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-            return sha256_hash.hexdigest()
-    except (FileNotFoundError, PermissionError) as e:
-        print(f"Error reading {os.path.basename(filepath)}: {e}")
+# --- Command Handling ---
+
+def resolve_directory_arg(args):
+    """Resolves a directory given by index or path; prints an error and returns None if invalid."""
+    target = " ".join(args)
+    if target.isdigit():
+        dirs, _ = get_directory_contents(state.current_directory)
+        index = int(target) - 1
+        if 0 <= index < len(dirs):
+            return os.path.join(state.current_directory, dirs[index])
+        print("[ERROR] Invalid directory index.")
         return None
+    path = os.path.normpath(os.path.join(state.current_directory, os.path.expanduser(target)))
+    if not os.path.isdir(path):
+        print(f"[ERROR] Directory not found: {path}")
+        return None
+    return path
 
-def find_duplicates():
-    """Finds duplicate files in the current directory and subdirectories based on content hash."""
-    hashes = {}
-    duplicates = {}
-    
-    print("Scanning for duplicate files... (This may take a while)")
-    
-    file_count = 0
-    for dirpath, _, filenames in os.walk(state.current_directory):
-        for filename in filenames:
-            file_path = os.path.join(dirpath, filename)
-            if os.path.islink(file_path) or os.path.getsize(file_path) == 0:
-                continue
-            
-            file_count += 1
-            sys.stdout.write(f"\rScanned {file_count} files...")
-            sys.stdout.flush()
+def parse_sync_args(args):
+    """Parses '<src> <dst> [--delete] [--dry-run] [--hash]'; returns None on error."""
+    flags = {a for a in args if a.startswith("--")}
+    paths = split_path_args([a for a in args if not a.startswith("--")])
+    unknown = flags - {"--delete", "--dry-run", "--hash"}
+    if len(paths) != 2 or unknown:
+        print("[ERROR] Usage: sync <src> <dst> [--delete] [--dry-run] [--hash]")
+        return None
+    src, dst = (os.path.join(state.current_directory, os.path.expanduser(p)) for p in paths)
+    delete, dry_run = "--delete" in flags, "--dry-run" in flags
+    if delete and not dry_run and not confirm_action(f"Delete items in {dst} that are not in {src}?"):
+        print("Sync cancelled.")
+        return None
+    return src, dst, delete, dry_run, "--hash" in flags
 
-            file_hash = hash_file(file_path)
-            if file_hash:
-                if file_hash in hashes:
-                    if file_hash not in duplicates:
-                        duplicates[file_hash] = [hashes[file_hash]]
-                    duplicates[file_hash].append(file_path)
-                else:
-                    hashes[file_hash] = file_path
+def parse_grep_args(args):
+    """Parses '[-i] [-F] <pattern>' into (pattern, ignore_case, fixed); returns None on error."""
+    args = list(args)
+    options = []
+    while args and args[0] in ("-i", "-F"):
+        options.append(args.pop(0))
+    pattern = " ".join(args)
+    if not pattern:
+        print("[ERROR] 'grep' requires a search pattern.")
+        return None
+    return pattern, "-i" in options, "-F" in options
 
-    print("\nScan complete.")
-    if not duplicates:
-        print("No duplicate files found.")
-    else:
-        print(f"Found {len(duplicates)} set(s) of duplicates:")
-        for i, (hash_val, files) in enumerate(duplicates.items()):
-            print(f"\n--- Set {i+1} (Size: {format_size(os.path.getsize(files[0]))}) ---")
-            for f in files:
-                print(f"  - {os.path.relpath(f, state.current_directory)}")
+def parse_diff_args(args):
+    """Parses '<dirA> <dirB> [--quick]'; returns None on error."""
+    paths = split_path_args([a for a in args if a != "--quick"])
+    if len(paths) != 2:
+        print("[ERROR] Usage: diff <dirA> <dirB> [--quick]")
+        return None
+    dir_a, dir_b = (os.path.join(state.current_directory, os.path.expanduser(p)) for p in paths)
+    return dir_a, dir_b, "--quick" in args
 
-# --- Command Handling ---
+def start_background_command(args):
+    """Runs a long operation as a background job, e.g. 'bg dupes'."""
+    if not args:
+        print("[ERROR] Usage: bg dupes|du|find <pattern>|grep [-i] [-F] <pattern>|sync <src> <dst>|diff <a> <b>|checksum|archive|scan|paste|del")
+        return
+    command, rest = args[0].lower(), args[1:]
+    if command == "dupes":
+        base_dir = state.current_directory
+        job = submit_job(f"dupes {base_dir}", find_duplicates, base_dir)
+    elif command == "du":
+        base_dir = resolve_directory_arg(rest) if rest else state.current_directory
+        if base_dir is None:
+            return
+        job = submit_job(f"du {base_dir}", show_disk_usage, base_dir, True)
+    elif command == "find":
+        if not rest:
+            print("[ERROR] 'find' requires a search pattern.")
+            return
+        pattern = " ".join(rest)
+        job = submit_job(f"find {pattern}", find_files, pattern, state.current_directory)
+    elif command == "grep":
+        parsed = parse_grep_args(rest)
+        if parsed is None:
+            return
+        pattern, ignore_case, fixed = parsed
+        job = submit_job(f"grep {' '.join(rest)}", grep_files, pattern, state.current_directory, ignore_case, fixed)
+    elif command == "sync":
+        parsed = parse_sync_args(rest)
+        if parsed is None:
+            return
+        job = submit_job(f"sync {parsed[0]} -> {parsed[1]}", sync_trees, *parsed)
+    elif command == "diff":
+        parsed = parse_diff_args(rest)
+        if parsed is None:
+            return
+        job = submit_job(f"diff {parsed[0]} {parsed[1]}", diff_trees, *parsed)
+    elif command == "checksum":
+        checksum_command(rest, background=True)
+        return
+    elif command == "archive":
+        archive_command(rest, background=True)
+        return
+    elif command == "scan":
+        base_dir = resolve_directory_arg(rest) if rest else state.current_directory
+        if base_dir is None:
+            return
+        job = submit_job(f"scan {base_dir}", scan_command, [base_dir])
+    elif command == "paste":
+        paste_handler(background=True)
+        return
+    elif command in ["del", "rm"]:
+        delete_selected(background=True)
+        return
+    else:
+        print(f"[ERROR] '{command}' cannot run in the background. Use dupes, du, find, grep, sync, diff, checksum, archive, scan, paste or del.")
+        return
+    print(f"Started job {job.id}: {job.name}")
 
 def display_help():
     """Displays the help message with all available commands."""
@@ -713,9 +4967,12 @@ def display_help():
         "Navigation": {
             "ls": "Refresh display.",
             "cd <dir>": "Change directory. Use '..' to go up, '-' for previous.",
+            "cd <archive>": "Browse a .zip/.tar(.gz/.bz2/.xz) as a read-only folder.",
             "cd <index>": "Enter directory by its number.",
             "back": "Go back in history.",
-            "forward": "Go forward in history."
+            "forward": "Go forward in history.",
+            "j <keywords>": "Jump to the most used/recent directory matching the keywords.",
+            "j -l [keywords]": "List ranked directory matches."
         },
         "Selection": {
             "s <index>": "Toggle selection for an item by number.",
@@ -723,26 +4980,53 @@ def display_help():
             "s all/clear/invert": "Select all, clear, or invert selection."
         },
         "File Operations": {
-            "del": "Delete selected items.",
+            "del": "Delete selected items (moved to trash, purged in background).",
+            "undo": "Restore the last deleted items if not yet purged.",
+            "purge": "Purge deleted items now.",
             "copy": "Copy selected items to clipboard.",
             "cut": "Cut selected items to clipboard.",
             "paste": "Paste items from clipboard here.",
             "newfile <name>": "Create a new empty file.",
             "newdir <name>": "Create a new directory.",
-            "ren <index/name> <new>": "Rename an item."
+            "ren <index/name> <new>": "Rename an item.",
+            "bulkren <re> <repl> [opts]": "Rename selection/find results; case= start= --dry-run, 'bulkren undo'",
+            "sync <src> <dst> [opts]": "Mirror new/changed files; --delete --dry-run --hash"
         },
         "System & View": {
             "open <index/name>": "Open a file or directory.",
             "view columns/list": "Change display mode.",
+            "view <file> [line|@offset]": "Page through a text file of any size (/search, g <line>).",
+            "head/tail <file> [N]": "Print the first or last N lines of a file.",
+            "follow <file>": "Print lines as they are appended to a file (Ctrl+C stops).",
             "hidden on/off": "Toggle visibility of hidden files.",
             "cmd": "Open a new terminal in this directory.",
+            "daemon start/stop/status": "Keep caches and jobs warm in a helper process.",
+            "<Tab>": "Complete command, file and directory names.",
             "exit/q": "Quit the application."
         },
         "Utilities": {
-            "find <pattern>": "Find files/dirs recursively.",
+            "find <pattern> [filters]": "Find by name/glob/re:regex; filters: size>1G mtime<7d type:f ext:mov kind:image depth:3 exclude:.git",
+            "grep [-i] [-F] <pattern>": "Search file contents recursively (regex).",
+            "results [page]": "Page through the last find/grep/diff results.",
+            "results <action> [range]": "copy, cut, del or checksum results (e.g. 'results copy 1-20').",
             "info <index/name>": "Show detailed info for an item.",
             "dupes": "Find duplicate files in current tree.",
+            "checksum [algo]": "Write checksums.<algo> for selection/tree (sha256, blake2b, md5, crc32).",
+            "checksum verify <file>": "Verify a sha256sum-style manifest in parallel.",
+            "archive <name> [store]": "Pack the selection into .zip/.tar/.tar.gz/.tar.xz (parallel gz/xz).",
+            "dedupe [--dry-run]": "Link duplicates from 'dupes' (reflink, else --hardlink).",
+            "diff <a> <b> [--quick]": "Compare two trees (only-in, size, content).",
+            "du [dir] [refresh]": "Disk usage per child (allocated/apparent).",
+            "scan [dir]": "Snapshot a tree's files for fast 'query' analytics.",
+            "query <what>": "top [N], larger <size>, older <age>, ext, hist (from the snapshot).",
             "help": "Show this help message."
+        },
+        "Background Jobs": {
+            "bg <command>": "Run dupes, du, find, grep, sync, diff, checksum, archive, scan, paste or del in the background.",
+            "jobs": "List background jobs.",
+            "job <id>": "Show progress and output of a job.",
+            "kill <id>": "Cancel a background job.",
+            "wait <id>": "Wait for a job to finish (Ctrl+C stops waiting)."
         }
     }
     for category, cmds in commands.items():
@@ -753,6 +5037,7 @@ def display_help():
 
 def process_command(user_input):
     """Processes the user's command input."""
+    reset_progress()
     parts = user_input.strip().split()
     if not parts:
         return
@@ -789,6 +5074,9 @@ def process_command(user_input):
         if state.history_position < len(state.history) - 1:
             state.history_position += 1
             state.current_directory = state.history[state.history_position]
+    elif command == "j":
+        if jump_command(args):
+            return # Keep the matches on screen
 
     # Selection
     elif command in ["s", "sel", "select"]:
@@ -797,6 +5085,10 @@ def process_command(user_input):
     # File Ops
     elif command in ["del", "rm"]:
         delete_selected()
+    elif command == "undo":
+        undo_delete()
+    elif command == "purge":
+        purge_all_trash()
     elif command == "copy":
         copy_paste_handler('copy')
     elif command == "cut":
@@ -813,6 +5105,15 @@ def process_command(user_input):
         if len(args) < 2: print("[ERROR] 'ren' requires <old_name/index> and <new_name>.")
         else: rename_item(args[0], " ".join(args[1:]))
 
+    elif command == "bulkren":
+        bulk_rename_command(args)
+        return # Keep the preview on screen
+    elif command == "sync":
+        parsed = parse_sync_args(args)
+        if parsed:
+            sync_trees(*parsed)
+        return # Keep the summary on screen
+
     # System & View
     elif command == "open":
         if not args: print("[ERROR] 'open' requires an index or name.")
@@ -820,8 +5121,14 @@ def process_command(user_input):
     elif command == "view":
         if args and args[0].lower() in ["columns", "list"]:
             state.view_mode = args[0].lower()
+        elif args:
+            view_file(args)
         else:
-            print("[ERROR] Usage: view columns|list")
+            print("[ERROR] Usage: view columns|list | view <file> [line|@offset]")
+    elif command in ["head", "tail", "follow"]:
+        if not args: print(f"[ERROR] '{command}' requires an index or name.")
+        else: {"head": head_file, "tail": tail_file, "follow": follow_file}[command](args)
+        return # Keep the lines on screen
     elif command == "hidden":
         if args and args[0].lower() in ["on", "off"]:
             state.show_hidden = (args[0].lower() == "on")
@@ -829,18 +5136,83 @@ def process_command(user_input):
             print("[ERROR] Usage: hidden on|off")
     elif command == "cmd":
         open_terminal()
+    elif command == "daemon":
+        daemon_command(args)
+        return
 
     # Utilities
     elif command == "find":
         if not args: print("[ERROR] 'find' requires a search pattern.")
         else: find_files(" ".join(args))
+        return # Keep the results on screen
+    elif command in ["results", "fr"]:
+        find_results_command(args)
+        return # Keep the results on screen
+    elif command == "grep":
+        parsed = parse_grep_args(args)
+        if parsed:
+            pattern, ignore_case, fixed = parsed
+            try:
+                grep_files(pattern, ignore_case=ignore_case, fixed=fixed)
+            except KeyboardInterrupt:
+                pass
+        return # Keep the matches on screen
     elif command == "info":
         if not args: print("[ERROR] 'info' requires an index or name.")
         else: get_item_info(" ".join(args))
     elif command == "dupes":
         find_duplicates()
+    elif command == "archive":
+        archive_command(args)
+        return # Keep the summary on screen
+    elif command == "scan":
+        scan_command(args)
+        return # Keep the summary on screen
+    elif command == "query":
+        query_command(args)
+        return # Keep the report on screen
+    elif command == "checksum":
+        checksum_command(args)
+        return # Keep the report on screen
+    elif command == "dedupe":
+        dry_run = "--dry-run" in args
+        sets = state.last_duplicates
+        if dry_run or not sets or confirm_action(f"Replace duplicates in {len(sets)} set(s) with links?"):
+            dedupe_duplicates(dry_run, hardlink_only="--hardlink" in args)
+        return # Keep the report on screen
+    elif command == "diff":
+        parsed = parse_diff_args(args)
+        if parsed:
+            diff_trees(*parsed)
+        return # Keep the report on screen
+    elif command == "du":
+        refresh = bool(args) and args[-1].lower() == "refresh"
+        if refresh:
+            args = args[:-1]
+        target = resolve_directory_arg(args) if args else state.current_directory
+        if target:
+            show_disk_usage(target, refresh)
+        return # Keep the report on screen
     elif command == "help":
         display_help()
+
+    # Background Jobs
+    elif command == "bg":
+        start_background_command(args)
+    elif command == "jobs":
+        list_jobs()
+        return # Keep the report on screen
+    elif command == "job":
+        if not args: print("[ERROR] 'job' requires a job id.")
+        else: show_job(args[0])
+        return
+    elif command == "kill":
+        if not args: print("[ERROR] 'kill' requires a job id.")
+        else: kill_job(args[0])
+    elif command == "wait":
+        if not args: print("[ERROR] 'wait' requires a job id.")
+        else: wait_job(args[0])
+        return
     
     else:
         print(f"[ERROR] Unknown command: '{command}'")
@@ -849,12 +5221,458 @@ def process_command(user_input):
     # After a successful command, refresh the display
     refresh_display()
 
+# --- Tab Completion ---
+
+COMPLETION_COMMANDS = sorted([
+    "archive", "back", "bg", "bulkren", "cd", "checksum", "cmd", "copy", "cut", "daemon", "dedupe",
+    "del", "diff", "du", "dupes", "exit", "find", "follow", "forward", "fr", "grep", "head", "help",
+    "hidden", "info", "j", "job", "jobs", "kill", "ls", "newdir", "newfile", "open", "paste", "purge",
+    "q", "query", "ren", "results", "rm", "s", "scan", "sel", "select", "sync", "tail", "undo", "view",
+    "wait",
+])
+
+def complete_path(text):
+    """
+    Completes a file or directory name from the listing cache (listing the
+    directory once, guarded, if it is not cached). Directories get a
+    trailing separator.
+    """
+    head, prefix = os.path.split(text)
+    directory = os.path.join(state.current_directory, os.path.expanduser(head)) if head else state.current_directory
+    archive, inner = resolve_archive_path(directory)
+    if archive is not None:
+        children = archive.children.get(inner, {})
+        matches = [(name, children[name].is_dir) for name in sorted(children) if name.startswith(prefix)]
+    else:
+        index = _listing_cache.name_index(directory)
+        if index is None:
+            try:
+                run_guarded(("list", directory), directory, _iter_directory_cached, directory)
+            except OSError:
+                return []
+            index = _listing_cache.name_index(directory)
+            if index is None:
+                return []
+        matches = index.with_prefix(prefix)
+    typed = text[:len(text) - len(prefix)]
+    return [typed + name + (os.sep if is_dir else "") for name, is_dir in matches
+            if prefix or state.show_hidden or not name.startswith('.')]
+
+def complete_line(line, text):
+    """Returns the completions for text, the last word of line: a command name first, then paths."""
+    if not line[:len(line) - len(text)].strip():
+        start = bisect.bisect_left(COMPLETION_COMMANDS, text)
+        end = bisect.bisect_left(COMPLETION_COMMANDS, text + "\U0010ffff", start)
+        return COMPLETION_COMMANDS[start:end]
+    return complete_path(text)
+
+def install_completion(complete):
+    """Binds Tab to complete(line, text) at the prompt where readline is available."""
+    try:
+        import readline
+    except ImportError:
+        return  # e.g. the plain Windows console: the prompt works without completion
+    matches = []
+
+    def completer(text, index):
+        if index == 0:
+            line = readline.get_line_buffer()[:readline.get_endidx()]
+            try:
+                matches[:] = complete(line, text)
+            except Exception:
+                matches[:] = []
+        return matches[index] if index < len(matches) else None
+
+    readline.set_completer_delims(" \t\n")
+    readline.set_completer(completer)
+    if "libedit" in (readline.__doc__ or ""):
+        readline.parse_and_bind("bind ^I rl_complete")
+    else:
+        readline.parse_and_bind("tab: complete")
+
+# --- Helper Daemon ---
+#
+# 'SelectPlus_V3.3.py --daemon' keeps one warm process holding the caches
+# (disk usage, archive indexes, find results) and the background jobs. A
+# console launched while it runs attaches over a Unix domain socket (named
+# pipe on Windows) and only forwards command lines and prints the replies.
+# Without a daemon the console runs stand-alone exactly as before.
+
+_daemon_session = None  # The DaemonSession currently attached, inside the daemon process
+_daemon_stop = False
+_daemon_send_lock = threading.RLock()  # Trash purge timers print from their own threads
+
+def get_daemon_address():
+    """Returns (address, family) for the per-user daemon endpoint."""
+    user = os.environ.get("USERNAME") or os.environ.get("USER") or "user"
+    if sys.platform == "win32":
+        return rf"\\.\pipe\selectplus-{user}", "AF_PIPE"
+    return os.path.join(tempfile.gettempdir(), f"selectplus-{user}.sock"), "AF_UNIX"
+
+def get_daemon_authkey(create=False):
+    """Reads (or creates) the secret a front end must present to the daemon."""
+    key_path = get_config_path("daemon.key")
+    try:
+        with open(key_path, "rb") as f:
+            return f.read()
+    except OSError:
+        if not create:
+            return None
+    key = os.urandom(32)
+    fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+def connect_daemon(timeout=3.0):
+    """
+    Returns (connection, busy) for a running daemon, or (None, False) to run
+    stand-alone. busy means another window is attached. A daemon that does
+    not greet within timeout seconds counts as not running.
+    """
+    authkey = get_daemon_authkey()
+    if authkey is None:
+        return None, False
+    address, family = get_daemon_address()
+    if family == "AF_UNIX" and not os.path.exists(address):
+        return None, False
+    result = []
+    abandoned = threading.Event()
+
+    def connect():
+        try:
+            conn = Client(address, family=family, authkey=authkey)
+            if conn.poll(timeout) and not abandoned.is_set():
+                result.append((conn, conn.recv()[1]))  # ("hello", busy)
+            else:
+                conn.close()
+        except (OSError, EOFError, ValueError, AuthenticationError):
+            pass
+
+    worker = threading.Thread(target=connect, daemon=True)
+    worker.start()
+    worker.join(timeout + 1)
+    if not result:
+        abandoned.set()
+        return None, False
+    return result[0]
+
+class DaemonStream:
+    """stdout of the daemon: buffers text and forwards it to the attached front end."""
+
+    def __init__(self):
+        self.buffer = []
+        self.size = 0
+        self.last_flush = time.time()
+
+    def write(self, text):
+        if _daemon_session is None:
+            return len(text)
+        with _daemon_send_lock:
+            self.buffer.append(text)
+            self.size += len(text)
+            if self.size > 8192 or time.time() - self.last_flush > 0.1:
+                self.flush()
+        return len(text)
+
+    def flush(self):
+        with _daemon_send_lock:
+            if self.buffer and _daemon_session is not None:
+                text = "".join(self.buffer)
+                self.buffer, self.size = [], 0
+                _daemon_session.conn.send(("output", text))
+            self.last_flush = time.time()
+
+    def isatty(self):
+        return False
+
+class DaemonSession:
+    """One attached front end. A reader thread collects its messages while commands run."""
+
+    def __init__(self, conn, width, height):
+        self.conn = conn
+        self.width = width
+        self.height = height
+        self.commands = deque()
+        self.answers = deque()
+        self.wakeup = threading.Condition()
+        self.interrupted = threading.Event()
+        self.closed = False
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        try:
+            while True:
+                message = self.conn.recv()
+                if message[0] == "interrupt":
+                    self.interrupted.set()
+                    continue
+                if message[0] == "complete":
+                    self.send("completions", complete_line(message[1], message[2]))
+                    continue
+                with self.wakeup:
+                    (self.answers if message[0] == "answer" else self.commands).append(message)
+                    self.wakeup.notify_all()
+        except (EOFError, OSError):
+            with self.wakeup:
+                self.closed = True
+                self.wakeup.notify_all()
+
+    def next_message(self, queue):
+        with self.wakeup:
+            while not queue and not self.closed:
+                self.wakeup.wait()
+            if not queue:
+                raise EOFError("front end detached")
+            return queue.popleft()
+
+    def send(self, *message):
+        with _daemon_send_lock:
+            sys.stdout.flush()
+            self.conn.send(message)
+
+    def ask(self, prompt):
+        self.send("input", prompt)
+        return self.next_message(self.answers)[1]
+
+    def take_interrupt(self):
+        if self.interrupted.is_set():
+            self.interrupted.clear()
+            return True
+        return False
+
+def daemon_status_text():
+    """One line describing the running daemon, for 'daemon status' in any window."""
+    jobs = sum(1 for job in state.background_tasks.values() if job.active)
+    return (f"SelectPlus daemon (pid {os.getpid()}, {'a window attached, ' if _daemon_attached.is_set() else ''}"
+            f"{jobs} active job(s), {len(_du_cache)} du, {len(_archive_indexes)} archive, "
+            f"{len(_listing_cache.entries)} listing and {len(_type_cache.entries)} file type cache entries).")
+
+_daemon_attached = threading.Event()
+
+def _accept_front_ends(listener, sessions):
+    """
+    Accept loop on its own thread, so a new window is answered at once even
+    while another is attached: it is told the daemon is busy and runs
+    stand-alone. 'daemon status' and 'daemon stop' are served here too.
+    """
+    while not _daemon_stop:
+        try:
+            conn = listener.accept()
+        except (OSError, EOFError, AuthenticationError):
+            if _daemon_stop:
+                return
+            continue
+        try:
+            conn.send(("hello", _daemon_attached.is_set()))
+            message = conn.recv() if conn.poll(10) else ("timeout",)
+        except (OSError, EOFError):
+            conn.close()
+            continue
+        if message[0] == "attach" and not _daemon_attached.is_set():
+            _daemon_attached.set()
+            sessions.put((conn, message))
+            continue
+        try:
+            if message[0] == "status":
+                conn.send(("status", daemon_status_text()))
+            elif message[0] == "stop":
+                session = _daemon_session
+                if session is not None:
+                    # Runs 'daemon stop' in the attached window, which then detaches
+                    with session.wakeup:
+                        session.commands.append(("command", "daemon stop", session.width, session.height))
+                        session.wakeup.notify_all()
+                else:
+                    _request_daemon_stop(sessions)
+                conn.send(("stopping", session is not None))
+        except (OSError, EOFError):
+            pass
+        conn.close()
+
+def _request_daemon_stop(sessions):
+    global _daemon_stop
+    _daemon_stop = True
+    sessions.put(None)  # Wake the session loop
+
+def run_daemon():
+    """Serves attached front ends one at a time until 'daemon stop'."""
+    global _daemon_session
+    address, family = get_daemon_address()
+    if connect_daemon()[0] is not None:
+        print("[ERROR] A SelectPlus daemon is already running.")
+        return
+    if family == "AF_UNIX" and os.path.exists(address):
+        os.remove(address)  # Stale socket from a daemon that did not exit cleanly
+    listener = Listener(address, family=family, authkey=get_daemon_authkey(create=True))
+    sys.stdout = JobOutputRouter(DaemonStream())
+    start_trash_sweep()
+    sessions = queue.Queue()
+    threading.Thread(target=_accept_front_ends, args=(listener, sessions), daemon=True).start()
+    try:
+        while not _daemon_stop:
+            item = sessions.get()
+            if item is None:
+                break
+            conn, attach = item
+            try:
+                _serve_session(conn, attach)
+            except (EOFError, OSError):
+                pass  # The front end went away; caches and jobs stay
+            finally:
+                _daemon_session = None
+                conn.close()
+                _daemon_attached.clear()
+                _frecency.save()
+    finally:
+        listener.close()
+        shutdown_jobs()  # Unpurged trash is swept by the next start
+        _frecency.save()
+
+def _serve_session(conn, attach):
+    """Runs commands for one front end until it detaches."""
+    global _daemon_session, _daemon_stop
+    _, cwd, width, height = attach  # ("attach", cwd, width, height)
+    session = _daemon_session = DaemonSession(conn, width, height)
+    if os.path.isdir(cwd):
+        visit_directory(cwd)  # Start where the front end was launched
+    refresh_display()
+    session.send("done", state.current_directory)
+    while True:
+        _, line, session.width, session.height = session.next_message(session.commands)
+        session.interrupted.clear()
+        try:
+            process_command(line) if line.strip() else refresh_display()
+        except KeyboardInterrupt:
+            print("\nInterrupted.")
+        except Exception as e:
+            print(f"\n[ERROR] An unexpected error occurred: {e}")
+        if not state.running or _daemon_stop:
+            state.running = True  # 'exit' only detaches the front end
+            session.send("bye", _daemon_stop)
+            return
+        session.send("done", state.current_directory)
+
+def _complete_remote(conn, line, text):
+    """Asks the daemon for completions, from its warm listing cache."""
+    conn.send(("complete", line, text))
+    while True:
+        message = conn.recv()
+        if message[0] == "completions":
+            return message[1]
+        if message[0] == "output":
+            sys.stdout.write(message[1])
+
+def run_attached(conn):
+    """Front-end loop: forwards command lines to the daemon and prints its replies."""
+    atexit.register(lambda: print("\nExiting SelectPlus. Goodbye!"))
+    install_completion(lambda line, text: _complete_remote(conn, line, text))
+    conn.send(("attach", state.current_directory, get_terminal_width(), get_terminal_height()))
+    cwd = _pump_daemon(conn)
+    while cwd is not None:
+        try:
+            user_input = input(f"\n{cwd}> ")
+        except KeyboardInterrupt:
+            print("\nUse 'exit' or 'q' to quit.")
+            continue
+        except EOFError:
+            break
+        conn.send(("command", user_input, get_terminal_width(), get_terminal_height()))
+        cwd = _pump_daemon(conn)
+    conn.close()
+
+def _pump_daemon(conn):
+    """Prints daemon output until the command completes; returns the new cwd or None on detach."""
+    while True:
+        try:
+            message = conn.recv()
+        except KeyboardInterrupt:
+            conn.send(("interrupt",))
+            continue
+        except (EOFError, OSError):
+            print("\n[ERROR] Lost connection to the SelectPlus daemon.")
+            return None
+        kind = message[0]
+        if kind == "output":
+            sys.stdout.write(message[1])
+            sys.stdout.flush()
+        elif kind == "clear":
+            os.system('cls' if os.name == 'nt' else 'clear')
+        elif kind == "input":
+            try:
+                answer = input(message[1])
+            except (KeyboardInterrupt, EOFError):
+                answer = ""
+            conn.send(("answer", answer))
+        elif kind == "done":
+            return message[1]
+        else:  # "bye"
+            if message[1]:
+                print("SelectPlus daemon stopped.")
+            return None
+
+def daemon_command(args):
+    """Handles 'daemon start|stop|status'."""
+    global _daemon_stop
+    action = args[0].lower() if args else "status"
+    if action == "status":
+        if _daemon_session is not None:
+            print(f"Attached to the {daemon_status_text()}")
+            return
+        conn, _ = connect_daemon()
+        if conn is None:
+            print("Running stand-alone.")
+            return
+        try:
+            conn.send(("status",))
+            print(f"Running stand-alone. Running: {conn.recv()[1]}")
+        except (OSError, EOFError):
+            print("Running stand-alone. A daemon is running but did not answer.")
+        finally:
+            conn.close()
+    elif action == "start":
+        conn = None if _daemon_session is not None else connect_daemon()[0]
+        if _daemon_session is not None or conn is not None:
+            if conn is not None:
+                conn.close()
+            print("[INFO] The daemon is already running.")
+            return
+        kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+        if sys.platform == "win32":
+            kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs["start_new_session"] = True
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "--daemon"], **kwargs)
+        print("Daemon started. New SelectPlus windows will attach to it.")
+    elif action == "stop":
+        if _daemon_session is None:
+            conn, _ = connect_daemon()
+            if conn is None:
+                print("[INFO] No daemon is running.")
+                return
+            try:
+                conn.send(("stop",))
+                _, attached = conn.recv()  # ("stopping", attached)
+                print("Daemon stops once the attached window finishes its current command." if attached
+                      else "Daemon stopped.")
+            except (OSError, EOFError):
+                print("[ERROR] The daemon did not answer.")
+            finally:
+                conn.close()
+            return
+        _daemon_stop = True
+    else:
+        print("[ERROR] Usage: daemon start|stop|status")
+
 # --- Main Application Loop ---
 
 def main():
     """The main entry point and loop for the application."""
     atexit.register(lambda: print("\nExiting SelectPlus. Goodbye!"))
+    install_completion(complete_line)
     
+    start_trash_sweep()
+
     # Initial display
     refresh_display()
 
@@ -876,6 +5694,21 @@ def main():
             print("Please restart the application.")
             time.sleep(3)
 
+    shutdown_jobs()  # Unpurged trash is swept by the next start
+    _frecency.save()
+
 
 if __name__ == "__main__":
-    main()
+    if "--daemon" in sys.argv:
+        run_daemon()
+    else:
+        use_daemon = state.get_setting("use_daemon", True) and "--standalone" not in sys.argv
+        daemon_conn, busy = connect_daemon() if use_daemon else (None, False)
+        if busy:
+            print("[INFO] The SelectPlus daemon is serving another window; running stand-alone.")
+            daemon_conn.close()
+            daemon_conn = None
+        if daemon_conn is not None:
+            run_attached(daemon_conn)
+        else:
+            main()